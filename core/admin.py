@@ -8,10 +8,50 @@ from .models import (
     ApprovalList,
     Assignee,
     ItemStatus,
-    ItemNotes
+    ItemNotes,
+    ExportJob,
+    InventorySummary,
+    ChangeLog,
+    SlowQuery
     )
 
 
+class ItemNotesAdmin(admin.ModelAdmin):
+    # ItemNotes.__str__ shows the item's name, so join it in rather than
+    # fetching it once per row
+    list_display = ('__str__', 'inserted_by', 'inserted_date')
+    list_select_related = ('item',)
+    raw_id_fields = ('item',)
+
+
+class ChangeLogAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'object_id', 'action', 'changed_date')
+    list_filter = ('kind', 'action')
+
+    # The log is append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = (
+        'recorded_date', 'duration_ms', 'view_name', 'frame', 'fingerprint'
+    )
+    list_filter = ('view_name',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(User)
 admin.site.register(MapLocation)
 admin.site.register(Area)
@@ -20,4 +60,8 @@ admin.site.register(InventoryItem)
 admin.site.register(ApprovalList)
 admin.site.register(Assignee)
 admin.site.register(ItemStatus)
-admin.site.register(ItemNotes)
+admin.site.register(ItemNotes, ItemNotesAdmin)
+admin.site.register(ExportJob)
+admin.site.register(InventorySummary)
+admin.site.register(ChangeLog, ChangeLogAdmin)
+admin.site.register(SlowQuery, SlowQueryAdmin)
@@ -0,0 +1,149 @@
+import base64
+import datetime
+
+from django.db.models import Q
+
+from .models import InventoryItem
+
+
+# Public field name -> ORM path.  A request's ``fields=`` picks from these
+# and only the chosen columns (and the joins they need) are queried.
+API_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'status_id': 'stat_id',
+    'status': 'stat__name',
+    'description': 'description',
+    'location_id': 'item_location_id',
+    'location': 'item_location__name',
+    'area_id': 'item_area_id',
+    'area': 'item_area__name',
+    'mfg_id': 'mfg_id',
+    'mfg': 'mfg__name',
+    'model_no': 'model_no',
+    'serial_no': 'serial_no',
+    'qty': 'qty',
+    'total_cost': 'total_cost',
+    'assigned_to_id': 'assigned_to_id',
+    'assigned_to': 'assigned_to__name',
+    'approved_by_id': 'approved_by_id',
+    'approved_by': 'approved_by__name',
+    'approved_date': 'approved_date',
+    'purchase_date': 'purchase_date',
+    'inserted_date': 'inserted_date',
+    'modified_by': 'modified_by',
+    'modified_date': 'modified_date',
+    'note_count': 'note_count',
+}
+
+# Query parameter -> foreign key it filters on (comma-separated ids)
+API_FILTERS = {
+    'status': 'stat_id',
+    'location': 'item_location_id',
+    'area': 'item_area_id',
+    'mfg': 'mfg_id',
+    'assigned_to': 'assigned_to_id',
+}
+
+# Orderings a cursor can follow, each backed by an index: the primary key,
+# or inv_purchase_date_idx (newest purchases first)
+API_ORDERINGS = {
+    'id': ('id',),
+    '-purchase_date': ('-purchase_date', 'id'),
+}
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class ApiError(ValueError):
+    pass
+
+
+def _ids(value, name):
+    try:
+        return [int(pk) for pk in value.split(',') if pk]
+    except ValueError:
+        raise ApiError(f'{name} must be a comma-separated list of ids.')
+
+
+def encode_cursor(order, row):
+    if order == 'id':
+        key = str(row['id'])
+    else:
+        key = f'{row["purchase_date"].isoformat()}|{row["id"]}'
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip('=')
+
+
+def _cursor_filter(queryset, order, cursor):
+    try:
+        key = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = key.decode()
+        if order == 'id':
+            return queryset.filter(id__gt=int(key))
+        purchase_date, pk = key.split('|')
+        purchase_date = datetime.date.fromisoformat(purchase_date)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ApiError('Invalid cursor.')
+    # Rows after (purchase_date, id) in "-purchase_date, id" order
+    return queryset.filter(
+        Q(purchase_date__lt=purchase_date)
+        | Q(purchase_date=purchase_date, id__gt=pk)
+    )
+
+
+def item_page(params):
+    """Returns ``(rows, next cursor)`` for an items API request.
+
+    Every page is an index range scan starting after the cursor, so its
+    cost does not grow with how far into the inventory the client is.
+    Raises ApiError for bad parameters.
+    """
+    fields = params.get('fields')
+    if fields:
+        names = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = [name for name in names if name not in API_FIELDS]
+        if unknown:
+            raise ApiError(f'Unknown fields: {", ".join(unknown)}.')
+    else:
+        names = list(API_FIELDS)
+
+    order = params.get('order', 'id')
+    if order not in API_ORDERINGS:
+        raise ApiError(f'order must be one of: {", ".join(API_ORDERINGS)}.')
+
+    try:
+        limit = int(params.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit must be a number.')
+    limit = min(max(limit, 1), MAX_LIMIT)
+
+    queryset = InventoryItem.objects.all()
+    for name, field in API_FILTERS.items():
+        if params.get(name):
+            queryset = queryset.filter(
+                **{f'{field}__in': _ids(params[name], name)}
+            )
+    if params.get('cursor'):
+        queryset = _cursor_filter(queryset, order, params['cursor'])
+
+    # The cursor needs the ordering columns whether or not they were asked
+    # for
+    paths = [API_FIELDS[name] for name in names]
+    for path in API_ORDERINGS[order]:
+        path = path.lstrip('-')
+        if path not in paths:
+            paths.append(path)
+
+    rows = list(
+        queryset.order_by(*API_ORDERINGS[order]).values(*paths)[:limit + 1]
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(order, rows[-1])
+
+    return [
+        {name: row[API_FIELDS[name]] for name in names} for row in rows
+    ], next_cursor
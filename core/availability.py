@@ -0,0 +1,190 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.core.cache import cache
+from django.db.models.functions import Upper
+
+from .models import User
+from .versions import VersionMarker
+
+
+# Whether a username or email is already in use, for the checks the sign-up
+# form makes as people type.  An answer goes through three layers:
+#
+# - a per-process Bloom filter of every value in use.  A miss means the
+#   value is free without asking anyone else; a hit may be a false
+#   positive, so it falls through.
+# - the shared cache of recent answers: "taken" for an hour, "free" (which
+#   a sign-up can make wrong) for a minute.
+# - a case-insensitive lookup, backed by the Upper() indexes on User.
+#
+# A filter is only trusted while USERS_VERSION is the one it was built at.
+# Saving a user bumps it (see core.signals) and adds the values to this
+# process's filters, so only the other processes rebuild theirs.  The
+# cached answers for names a save replaces, or a delete frees, are
+# dropped.  Bulk inserts skip the signals and must call
+# bump_users_version() themselves.
+
+FIELDS = ('username', 'email')
+
+FALSE_POSITIVE_RATE = 0.01
+
+# Rebuild a filter at least this often, so it does not fill up with
+# deleted and renamed users, but no more often than REBUILD_INTERVAL
+FILTER_MAX_AGE = 15 * 60
+REBUILD_INTERVAL = 30
+
+TAKEN_TIMEOUT = 60 * 60
+FREE_TIMEOUT = 60
+
+USERS_VERSION = VersionMarker('users')
+
+# field -> (version, built at, BloomFilter)
+_local = {}
+_lock = threading.Lock()
+
+
+class BloomFilter:
+    """Set membership in a fixed number of bits; may answer a false "yes",
+    never a false "no"."""
+
+    def __init__(self, capacity, error_rate=FALSE_POSITIVE_RATE):
+        capacity = max(capacity, 1)
+        self.size = max(
+            int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8
+        )
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        # Double hashing: k positions from one digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+
+def normalize(value):
+    return (value or '').strip().upper()
+
+
+def bump_users_version():
+    return USERS_VERSION.bump()
+
+
+def _cache_key(field, value):
+    digest = hashlib.sha1(value.encode()).hexdigest()
+    return f'available:{field}:{digest}'
+
+
+def _build(field):
+    # Room to grow before false positives go much over the target rate
+    bloom = BloomFilter(2 * User.objects.count() + 1000)
+    for value in User.objects.values_list(field, flat=True).iterator():
+        value = normalize(value)
+        if value:
+            bloom.add(value)
+    return bloom
+
+
+def _filter(field):
+    """This process's filter for ``field``, or None while it is out of
+    date and not due a rebuild yet."""
+    version = USERS_VERSION.version()
+    now = time.monotonic()
+    state = _local.get(field)
+    if state is not None:
+        current = state[0] == version
+        if current and now - state[1] < FILTER_MAX_AGE:
+            return state[2]
+        if now - state[1] < REBUILD_INTERVAL:
+            return state[2] if current else None
+
+    with _lock:
+        state = _local.get(field)
+        if state is None or state[1] <= now:
+            # The version is read before loading, so a user saved during
+            # the load leaves the filter out of date rather than missing
+            # them
+            _local[field] = state = (version, time.monotonic(), _build(field))
+    return state[2] if state[0] == version else None
+
+
+def _query(field, value):
+    return User.objects.annotate(
+        normalized=Upper(field)
+    ).filter(normalized=value).exists()
+
+
+def in_use(field, value):
+    """Whether any user has ``value`` as their ``field``, asked of the
+    database.  The same rule as is_taken(), for validating a submitted
+    form."""
+    value = normalize(value)
+    return bool(value) and _query(field, value)
+
+
+def is_taken(field, value):
+    """Whether any user has ``value`` as their ``field``, ignoring case and
+    surrounding whitespace."""
+    value = normalize(value)
+    if not value:
+        return False
+    bloom = _filter(field)
+    if bloom is not None and value not in bloom:
+        return False
+
+    key = _cache_key(field, value)
+    taken = cache.get(key)
+    if taken is None:
+        taken = _query(field, value)
+        cache.set(key, taken, TAKEN_TIMEOUT if taken else FREE_TIMEOUT)
+    return taken
+
+
+def user_saved(values, old_values=None):
+    """Records the ``{field: value}`` of a user just saved, and forgets
+    the ``old_values`` they replaced."""
+    values = {
+        field: normalize(value) for field, value in values.items() if value
+    }
+    for field, value in values.items():
+        cache.set(_cache_key(field, value), True, TAKEN_TIMEOUT)
+    if old_values:
+        # The filters cannot drop a value; they answer "maybe" for it until
+        # rebuilt, and the lookup behind them says it is free
+        user_deleted({
+            field: value
+            for field, value in old_values.items()
+            if normalize(value) != values.get(field)
+        })
+    version = bump_users_version()
+    with _lock:
+        for field, value in values.items():
+            state = _local.get(field)
+            if state is None:
+                continue
+            state[2].add(value)
+            if state[0] == version - 1:
+                # Nobody else saved a user in between
+                _local[field] = (version, state[1], state[2])
+
+
+def user_deleted(values):
+    """Forgets the ``{field: value}`` of a user deleted or renamed."""
+    for field, value in values.items():
+        if value:
+            cache.delete(_cache_key(field, normalize(value)))
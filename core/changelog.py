@@ -0,0 +1,128 @@
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .datatables import ROW_VALUES
+from .models import ChangeLog, InventoryItem, ItemNotes
+from .rowcache import invalidate_rows
+from .versions import VersionMarker
+
+
+MAX_CHANGES = 1000
+
+# Rows younger than this are held back from the feed, and from the token
+# for "now".  Ids are handed out when a row is inserted, not when its
+# transaction commits, so a client reading right up to the newest row could
+# pass over a lower id that commits a moment later.  The window only covers
+# transactions that commit within SETTLE_SECONDS of logging a change: the
+# writes here are single requests and Celery tasks, and anything that holds
+# a transaction open for longer (a huge import, a stuck lock) can still
+# commit changes behind a client's token, which it then never sees.
+SETTLE_SECONDS = 5
+
+NOTE_VALUES = ('id', 'item_id', 'comment', 'inserted_by', 'inserted_date')
+
+# Bumped after every logged write commits; drives the inventory ETags.
+# The written items' cached table rows are dropped at the same time.
+INVENTORY_VERSION = VersionMarker('inventory')
+
+
+def log_change(kind, object_id, item_id, action):
+    ChangeLog.objects.create(
+        kind=kind, object_id=object_id, item_id=item_id, action=action
+    )
+    transaction.on_commit(INVENTORY_VERSION.bump)
+    transaction.on_commit(lambda: invalidate_rows([item_id]))
+
+
+def log_item_changes(item_ids, action):
+    """Logs ``action`` for many items at once, e.g. after bulk writes."""
+    now = timezone.now()
+    ChangeLog.objects.bulk_create([
+        ChangeLog(
+            kind=ChangeLog.Kind.ITEM,
+            object_id=item_id,
+            item_id=item_id,
+            action=action,
+            changed_date=now
+        )
+        for item_id in item_ids
+    ])
+    transaction.on_commit(INVENTORY_VERSION.bump)
+    transaction.on_commit(lambda: invalidate_rows(item_ids))
+
+
+def _settled():
+    return timezone.now() - datetime.timedelta(seconds=SETTLE_SECONDS)
+
+
+def latest_token():
+    """Token for "now": a copy taken after asking for it holds every change
+    up to it, so polling from it misses nothing.  Changes still inside the
+    settle window are left after it, as the feed does not serve them yet.
+    """
+    return ChangeLog.objects.filter(
+        changed_date__lte=_settled()
+    ).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def changes_since(token, limit=MAX_CHANGES):
+    """Returns the changes after ``token``, oldest first.
+
+    Each change carries the current state of what it touched (None once
+    deleted), fetched with one query per kind, so a client applies a page
+    in order and ends up in sync.  ``next`` is the token for the following
+    call and ``more`` says whether to make it straight away.
+    """
+    changes = list(
+        ChangeLog.objects.filter(
+            id__gt=token, changed_date__lte=_settled()
+        ).order_by('id')[:limit + 1]
+    )
+    more = len(changes) > limit
+    changes = changes[:limit]
+
+    item_ids = set()
+    note_ids = set()
+    for change in changes:
+        if change.action != ChangeLog.Action.DELETE:
+            if change.kind == ChangeLog.Kind.ITEM:
+                item_ids.add(change.object_id)
+            else:
+                note_ids.add(change.object_id)
+
+    items = {}
+    if item_ids:
+        items = {
+            row['id']: row
+            for row in InventoryItem.objects.filter(
+                id__in=item_ids
+            ).values(*ROW_VALUES)
+        }
+    notes = {}
+    if note_ids:
+        notes = {
+            row['id']: row
+            for row in ItemNotes.objects.filter(
+                id__in=note_ids
+            ).values(*NOTE_VALUES)
+        }
+
+    current = {ChangeLog.Kind.ITEM: items, ChangeLog.Kind.NOTE: notes}
+    return {
+        'changes': [
+            {
+                'token': change.id,
+                'kind': change.kind,
+                'id': change.object_id,
+                'item_id': change.item_id,
+                'action': change.action,
+                'changed_date': change.changed_date,
+                'data': current[change.kind].get(change.object_id),
+            }
+            for change in changes
+        ],
+        'next': changes[-1].id if changes else token,
+        'more': more,
+    }
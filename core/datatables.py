@@ -0,0 +1,273 @@
+import datetime
+from collections import namedtuple
+
+from django.db.models import Q
+from django.template.defaultfilters import date as date_filter, floatformat
+from django.urls import reverse
+
+from .models import InventoryItem
+
+
+# One entry per column of the inventory table, in the same order as the
+# <th> cells in templates/core/inventory.html.  ``fields`` are the ORM paths
+# used for ordering and searching; an empty tuple marks a column that is
+# neither orderable nor searchable (the Edit / Notes buttons and the bulk
+# edit checkbox).
+Column = namedtuple('Column', ['name', 'kind', 'fields'])
+
+INVENTORY_COLUMNS = [
+    Column('id', 'number', ('id',)),
+    Column('stat', 'text', ('stat__name',)),
+    Column('name', 'text', ('name',)),
+    Column('description', 'text', ('description',)),
+    Column('item_location', 'text', ('item_location__name',)),
+    Column('item_area', 'text', ('item_area__name',)),
+    Column('mfg', 'text', ('mfg__name',)),
+    Column('model_no', 'text', ('model_no',)),
+    Column('serial_no', 'text', ('serial_no',)),
+    Column('qty', 'number', ('qty',)),
+    Column('total_cost', 'number', ('total_cost',)),
+    Column('assigned_to', 'text', ('assigned_to__name',)),
+    Column('approved_by', 'text', ('approved_by__name',)),
+    Column('approved_date', 'date', ('approved_date',)),
+    Column('purchase_date', 'date', ('purchase_date',)),
+    Column(
+        'inserted_by', 'text',
+        ('inserted_by__last_name', 'inserted_by__first_name')
+    ),
+    Column('inserted_date', 'date', ('inserted_date',)),
+    Column('modified_by', 'text', ('modified_by',)),
+    Column('modified_date', 'date', ('modified_date',)),
+    Column('edit', None, ()),
+    Column('notes', None, ()),
+    Column('select', None, ()),
+]
+
+# Columns fetched for each visible row; everything the table displays comes
+# from this single projected query.
+ROW_VALUES = (
+    'id',
+    'stat__name',
+    'name',
+    'description',
+    'item_location__name',
+    'item_area__name',
+    'mfg__name',
+    'model_no',
+    'serial_no',
+    'qty',
+    'total_cost',
+    'assigned_to__name',
+    'approved_by__name',
+    'approved_date',
+    'purchase_date',
+    'inserted_by__last_name',
+    'inserted_by__first_name',
+    'inserted_date',
+    'modified_by',
+    'modified_date',
+    'note_count',
+)
+
+DEFAULT_ORDER = [(14, 'desc')]
+MAX_PAGE_LENGTH = 1000
+DATE_INPUT_FORMATS = ('%m/%d/%Y', '%Y-%m-%d')
+
+
+def _to_int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _parse_date(value):
+    for fmt in DATE_INPUT_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _column_q(column, value):
+    """Builds the filter for a single column's search box."""
+    if column.kind == 'text':
+        q = Q()
+        for field in column.fields:
+            q |= Q(**{f'{field}__icontains': value})
+        return q
+
+    if column.kind == 'number':
+        field = column.fields[0]
+        if column.name == 'total_cost':
+            return Q(**{f'{field}__startswith': value.lstrip('$')})
+        if value.isdigit():
+            return Q(**{field: int(value)})
+        return None
+
+    if column.kind == 'date':
+        field = column.fields[0]
+        parsed = _parse_date(value)
+        if parsed is not None:
+            return Q(**{field: parsed})
+        if len(value) == 4 and value.isdigit():
+            return Q(**{f'{field}__year': int(value)})
+        return None
+
+    return None
+
+
+def _global_q(value):
+    """ORs the search term across the text columns (and the ID)."""
+    q = Q()
+    for column in INVENTORY_COLUMNS:
+        if column.kind == 'text':
+            q |= _column_q(column, value)
+    if value.isdigit():
+        q |= Q(id=int(value))
+    return q
+
+
+def filter_inventory(queryset, params):
+    """Applies DataTables global and per-column search to ``queryset``."""
+    search = params.get('search[value]', '').strip()
+    if search:
+        queryset = queryset.filter(_global_q(search))
+
+    for index, column in enumerate(INVENTORY_COLUMNS):
+        if not column.fields:
+            continue
+        value = params.get(f'columns[{index}][search][value]', '').strip()
+        if not value:
+            continue
+        column_q = _column_q(column, value)
+        if column_q is None:
+            return queryset.none()
+        queryset = queryset.filter(column_q)
+
+    return queryset
+
+
+def order_inventory(queryset, params):
+    """Applies DataTables ordering, falling back to the page default."""
+    order = []
+    i = 0
+    while f'order[{i}][column]' in params:
+        index = _to_int(params.get(f'order[{i}][column]'), -1)
+        direction = params.get(f'order[{i}][dir]', 'asc')
+        if 0 <= index < len(INVENTORY_COLUMNS):
+            order.append((index, direction))
+        i += 1
+
+    if not order:
+        order = DEFAULT_ORDER
+
+    ordering = []
+    for index, direction in order:
+        prefix = '-' if direction == 'desc' else ''
+        for field in INVENTORY_COLUMNS[index].fields:
+            ordering.append(prefix + field)
+
+    # Keep paging stable when the ordered column has duplicate values
+    ordering.append('id')
+    return queryset.order_by(*ordering)
+
+
+def table_params(params):
+    """Keeps just the search, filter and sort parameters of a table request.
+
+    Exports use these to reproduce what the user is looking at without the
+    paging (``start``/``length``) that would cut it down to one page.
+    """
+    return {
+        key: value
+        for key, value in params.items()
+        if key.startswith(('search[', 'columns[', 'order['))
+        and key.endswith(('[value]', '[column]', '[dir]'))
+    }
+
+
+def filtered_inventory(params):
+    """Returns every item matching the table's filters, in its order."""
+    queryset = filter_inventory(InventoryItem.objects.all(), params)
+    if 'order[0][column]' in params:
+        queryset = order_inventory(queryset, params)
+    return queryset
+
+
+def format_row(values):
+    """Shapes one ``ROW_VALUES`` dict the way inventory.html displays it."""
+    inserted_by = ''
+    if values['inserted_by__last_name'] or values['inserted_by__first_name']:
+        inserted_by = (
+            values['inserted_by__last_name'] + ', '
+            + values['inserted_by__first_name']
+        )
+    total_cost = ''
+    if values['total_cost'] is not None:
+        total_cost = '$' + floatformat(values['total_cost'], 2)
+
+    return {
+        'id': values['id'],
+        'stat': values['stat__name'],
+        'name': values['name'],
+        'description': values['description'],
+        'item_location': values['item_location__name'],
+        'item_area': values['item_area__name'],
+        'mfg': values['mfg__name'],
+        'model_no': values['model_no'],
+        'serial_no': values['serial_no'] or '',
+        'qty': values['qty'],
+        'total_cost': total_cost,
+        'assigned_to': values['assigned_to__name'] or '',
+        'approved_by': values['approved_by__name'],
+        'approved_date': date_filter(values['approved_date'], 'm/d/Y'),
+        'purchase_date': date_filter(values['purchase_date'], 'm/d/Y'),
+        'inserted_by': inserted_by,
+        'inserted_date': date_filter(values['inserted_date'], 'm/d/Y'),
+        'modified_by': values['modified_by'] or '',
+        'modified_date': date_filter(values['modified_date'], 'm/d/Y'),
+        'edit': reverse('core:edit_item', args=[values['id']]),
+        'notes': reverse('core:notes', args=[values['id']]),
+        'note_count': values['note_count'],
+    }
+
+
+def inventory_page(queryset, params, row_source=None):
+    """Returns the DataTables server-side response for ``queryset``.
+
+    With ``row_source`` only the page's ids are queried and
+    ``row_source(ids)`` supplies the formatted rows (see core.rowcache).
+    """
+    records_total = queryset.count()
+    filtered = filter_inventory(queryset, params)
+    if filtered is queryset:
+        records_filtered = records_total
+    else:
+        records_filtered = filtered.count()
+
+    start = max(_to_int(params.get('start'), 0), 0)
+    length = _to_int(params.get('length'), 10)
+    if length < 0 or length > MAX_PAGE_LENGTH:
+        length = MAX_PAGE_LENGTH
+
+    ordered = order_inventory(filtered, params)
+    if row_source is None:
+        rows = ordered.values(*ROW_VALUES)[start:start + length]
+        data = [format_row(values) for values in rows]
+    else:
+        ids = ordered.values_list('id', flat=True)[start:start + length]
+        data = row_source(list(ids))
+
+    page = {
+        'recordsTotal': records_total,
+        'recordsFiltered': records_filtered,
+        'data': data,
+    }
+    # The inventory page leaves ``draw`` out of the URL, and sets it on the
+    # response itself, so identical requests have identical URLs and can be
+    # answered with 304 Not Modified
+    if 'draw' in params:
+        page['draw'] = _to_int(params.get('draw'), 0)
+    return page
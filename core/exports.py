@@ -0,0 +1,229 @@
+import csv
+import os
+from collections import namedtuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+
+from .models import InventoryItem
+
+
+# Rows are pulled from the database this many at a time.  On PostgreSQL
+# iterator() uses a server-side cursor, so memory stays flat however many
+# items there are.
+CHUNK_SIZE = 2000
+
+EXPORT_HEADERS = [
+    'ID',
+    'Status',
+    'Item',
+    'Description',
+    'Model #',
+    'Serial #',
+    'Qty',
+    'Total Cost',
+    'Assigned To',
+    'Approval Date',
+    'Purchase Date',
+    'Inserted By Last Name',
+    'Inserted By First Name',
+    'Inserted Date',
+    'Modified By',
+    'Modified Date',
+    'Approved By',
+    'Location',
+    'Area',
+    'Mfg'
+]
+
+EXPORT_FIELDS = [
+    'id',
+    'stat__name',
+    'name',
+    'description',
+    'model_no',
+    'serial_no',
+    'qty',
+    'total_cost',
+    'assigned_to__name',
+    'approved_date',
+    'purchase_date',
+    'inserted_by__last_name',
+    'inserted_by__first_name',
+    'inserted_date',
+    'modified_by',
+    'modified_date',
+    'approved_by_id__name',
+    'item_location_id__name',
+    'item_area_id__name',
+    'mfg_id__name'
+]
+
+
+# Low-cardinality lookup names are dictionary-encoded in Parquet files
+DICTIONARY = pa.dictionary(pa.int32(), pa.string())
+
+# (column name, ORM path, Arrow type) for the analytics export, which
+# carries the joined lookup names rather than IDs
+PARQUET_COLUMNS = [
+    ('id', 'id', pa.int64()),
+    ('status', 'stat__name', DICTIONARY),
+    ('name', 'name', pa.string()),
+    ('description', 'description', pa.string()),
+    ('location', 'item_location__name', DICTIONARY),
+    ('area', 'item_area__name', DICTIONARY),
+    ('manufacturer', 'mfg__name', DICTIONARY),
+    ('model_no', 'model_no', pa.string()),
+    ('serial_no', 'serial_no', pa.string()),
+    ('qty', 'qty', pa.int32()),
+    ('total_cost', 'total_cost', pa.decimal128(8, 2)),
+    ('assigned_to', 'assigned_to__name', DICTIONARY),
+    ('approved_by', 'approved_by__name', DICTIONARY),
+    ('approved_date', 'approved_date', pa.date32()),
+    ('purchase_date', 'purchase_date', pa.date32()),
+    ('inserted_by_last_name', 'inserted_by__last_name', DICTIONARY),
+    ('inserted_by_first_name', 'inserted_by__first_name', DICTIONARY),
+    ('inserted_date', 'inserted_date', pa.date32()),
+    ('modified_by', 'modified_by', DICTIONARY),
+    ('modified_date', 'modified_date', pa.date32()),
+]
+
+PARQUET_FIELDS = [field for _, field, _ in PARQUET_COLUMNS]
+
+# Rows per Parquet record batch (and so per row group)
+PARQUET_BATCH_SIZE = 16384
+
+# Spreadsheet number formats, keyed by position in ``EXPORT_FIELDS``
+XLSX_FORMATS = {
+    EXPORT_FIELDS.index('total_cost'): '#,##0.00',
+    EXPORT_FIELDS.index('approved_date'): 'mm/dd/yyyy',
+    EXPORT_FIELDS.index('purchase_date'): 'mm/dd/yyyy',
+    EXPORT_FIELDS.index('inserted_date'): 'mm/dd/yyyy',
+    EXPORT_FIELDS.index('modified_date'): 'mm/dd/yyyy',
+}
+
+
+class Echo:
+    """File-like object whose write() hands back what it was given."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset=None, fields=EXPORT_FIELDS):
+    """Yields one tuple of ``fields`` per item, a chunk at a time."""
+    if queryset is None:
+        queryset = InventoryItem.objects.all()
+    if not queryset.ordered:
+        queryset = queryset.order_by('id')
+    return queryset.values_list(
+        *fields
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def csv_lines(rows):
+    """Yields the export as CSV lines, header first."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADERS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def export_path(file_name):
+    """Absolute path of a background export file under ``EXPORT_ROOT``."""
+    return os.path.join(settings.EXPORT_ROOT, file_name)
+
+
+def write_csv(rows, path):
+    """Writes the CSV export for ``rows`` to ``path``."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        for line in csv_lines(rows):
+            f.write(line)
+
+
+def write_xlsx(rows, path):
+    """Writes the export for ``rows`` to ``path`` as an Excel workbook.
+
+    The workbook is opened write-only, so rows are flushed to disk as they
+    are appended.  Values keep their types: Decimal costs, real dates and
+    integer quantities.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Inventory')
+    sheet.freeze_panes = 'A2'
+    sheet.append(EXPORT_HEADERS)
+
+    for row in rows:
+        row = list(row)
+        for index, number_format in XLSX_FORMATS.items():
+            if row[index] is not None:
+                cell = WriteOnlyCell(sheet, value=row[index])
+                cell.number_format = number_format
+                row[index] = cell
+        sheet.append(row)
+
+    workbook.save(path)
+
+
+def _record_batch(schema, rows):
+    columns = []
+    for index, field in enumerate(schema):
+        values = [row[index] for row in rows]
+        if pa.types.is_dictionary(field.type):
+            array = pa.array(values, type=pa.string()).dictionary_encode()
+        else:
+            array = pa.array(values, type=field.type)
+        columns.append(array)
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def write_parquet(rows, path):
+    """Writes ``PARQUET_FIELDS`` rows to ``path`` as a Parquet file.
+
+    Rows are gathered into Arrow record batches of ``PARQUET_BATCH_SIZE``
+    as they come off the cursor and each batch is written as a row group.
+    """
+    schema = pa.schema(
+        [(name, arrow_type) for name, _, arrow_type in PARQUET_COLUMNS]
+    )
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == PARQUET_BATCH_SIZE:
+                writer.write_batch(_record_batch(schema, batch))
+                batch = []
+        if batch:
+            writer.write_batch(_record_batch(schema, batch))
+
+
+ExportFormat = namedtuple('ExportFormat', ['fields', 'writer', 'content_type'])
+
+EXPORT_FORMATS = {
+    'csv': ExportFormat(EXPORT_FIELDS, write_csv, 'text/csv'),
+    'xlsx': ExportFormat(
+        EXPORT_FIELDS,
+        write_xlsx,
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    ),
+    'parquet': ExportFormat(
+        PARQUET_FIELDS,
+        write_parquet,
+        'application/vnd.apache.parquet'
+    ),
+}
+
+
+def write_export(file_format, path, queryset=None, rows=None):
+    """Writes an export in ``file_format`` to ``path`` (or a file object).
+
+    ``rows`` defaults to every item in ``queryset`` (or the whole
+    inventory) projected onto the format's fields.
+    """
+    export_format = EXPORT_FORMATS[file_format]
+    if rows is None:
+        rows = export_rows(queryset, fields=export_format.fields)
+    export_format.writer(rows, path)
@@ -1,11 +1,22 @@
+import datetime
+
 from django import forms
+from django.db import transaction
 from django.contrib.auth.forms import (
     AuthenticationForm, UserCreationForm, UserChangeForm
 )
-from .models import Contact, User, ItemNotes, InventoryItem
+from .models import ChangeLog, Contact, User, ItemNotes, InventoryItem
 from django.core.exceptions import ValidationError
 from captcha.fields import ReCaptchaField
+from pytz import timezone
 from core.tasks import send_registration_email_task
+from .availability import in_use
+from .lookups import LOOKUP_MODELS, lookup_row
+from .summaries import record_bulk_update
+from .changelog import log_item_changes
+
+
+EST = timezone('US/Eastern')
 
 
 class AuthenticationFormWithCaptchaField(AuthenticationForm):
@@ -33,6 +44,14 @@ class NewUserForm(UserCreationForm):
             "password2"
         )
 
+    def clean_email(self):
+        # Ignoring case, like the username check and the availability
+        # checks made while the form is filled in
+        email = self.cleaned_data['email']
+        if in_use('email', email):
+            raise ValidationError('This email already exists!')
+        return email
+
     def send_registration_email(self):
         send_registration_email_task.delay(
             self.cleaned_data['first_name'],
@@ -98,8 +117,54 @@ class ContactForm(forms.ModelForm):
             return contact
 
 
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField that validates against the cached lookup rows.
+
+    The chosen object is built from the cached row instead of being fetched
+    from the database.
+    """
+
+    def __init__(self, lookup, *args, **kwargs):
+        self.lookup = lookup
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            pk = int(value)
+        except (TypeError, ValueError):
+            pk = None
+        row = lookup_row(self.lookup, pk) if pk is not None else None
+        if row is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return self.queryset.model(**row)
+
+
 class InventoryForm(forms.ModelForm):
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in LOOKUP_MODELS:
+            field = self.fields[name]
+            self.fields[name] = CachedModelChoiceField(
+                name,
+                queryset=field.queryset,
+                required=field.required,
+                label=field.label
+            )
+
+    def _get_validation_exclusions(self):
+        # The lookup fields were already checked against the cache, so skip
+        # the model's per-foreign-key existence queries
+        exclude = super()._get_validation_exclusions()
+        exclude.update(LOOKUP_MODELS)
+        return exclude
+
     class Meta:
         model = InventoryItem
         fields = (
@@ -120,6 +185,99 @@ class InventoryForm(forms.ModelForm):
         )
 
 
+# Fields that can be changed on many items at once from the inventory page
+BULK_EDIT_FIELDS = (
+    'stat',
+    'item_location',
+    'item_area',
+    'assigned_to',
+    'approved_by',
+)
+
+MAX_BULK_EDIT_ITEMS = 1000
+
+
+class BulkEditForm(forms.Form):
+    """Applies the same changes to a set of selected inventory items.
+
+    Every changed field is written with a single UPDATE; fields left blank
+    are not touched.
+    """
+    ids = forms.CharField()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in BULK_EDIT_FIELDS:
+            self.fields[name] = CachedModelChoiceField(
+                name,
+                queryset=LOOKUP_MODELS[name].objects.all(),
+                required=False
+            )
+
+    def clean_ids(self):
+        try:
+            ids = {int(pk) for pk in self.cleaned_data['ids'].split(',')}
+        except ValueError:
+            raise ValidationError('Invalid item selection.')
+        if len(ids) > MAX_BULK_EDIT_ITEMS:
+            raise ValidationError(
+                f'Select at most {MAX_BULK_EDIT_ITEMS} items at a time.'
+            )
+        return sorted(ids)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        changes = {
+            name: cleaned_data[name]
+            for name in BULK_EDIT_FIELDS
+            if cleaned_data.get(name) is not None
+        }
+        if not changes:
+            raise ValidationError('Choose at least one change.')
+
+        # Location and area must agree for every selected item, which is
+        # checked once for the whole selection
+        location = changes.get('item_location')
+        area = changes.get('item_area')
+        if location is not None and area is None:
+            raise ValidationError('Choose an area in the new location.')
+        if area is not None:
+            if location is not None:
+                if area.map_loc_id != location.id:
+                    raise ValidationError(
+                        f'{area.name} is not in {location.name}.'
+                    )
+            elif 'ids' in cleaned_data and InventoryItem.objects.filter(
+                id__in=cleaned_data['ids']
+            ).exclude(item_location_id=area.map_loc_id).exists():
+                raise ValidationError(
+                    f'Some selected items are not in the location of '
+                    f'{area.name}; choose the location too.'
+                )
+
+        self.changes = changes
+        return cleaned_data
+
+    def save(self, user):
+        """Updates the selected items and returns how many changed."""
+        with transaction.atomic():
+            # Lock the rows so the summaries and change log see exactly
+            # the items being updated
+            ids = list(
+                InventoryItem.objects.select_for_update().filter(
+                    id__in=self.cleaned_data['ids']
+                ).values_list('id', flat=True)
+            )
+            items = InventoryItem.objects.filter(id__in=ids)
+            record_bulk_update(items, self.changes)
+            log_item_changes(ids, ChangeLog.Action.UPDATE)
+            return items.update(
+                modified_by=str(user),
+                modified_date=datetime.datetime.now(tz=EST),
+                **self.changes
+            )
+
+
 class NoteForm(forms.ModelForm):
 
     class Meta:
@@ -0,0 +1,290 @@
+import csv
+import datetime
+import io
+
+from django.db import transaction
+from django.db.models.functions import Upper
+from openpyxl import load_workbook
+from pytz import timezone
+
+from .exports import Echo
+from .forms import InventoryForm
+from .lookups import LOOKUP_MODELS
+from .changelog import log_item_changes
+from .models import Area, ChangeLog, InventoryItem
+from .summaries import record_created
+
+
+EST = timezone('US/Eastern')
+
+# Rows validated, resolved and inserted together
+BATCH_SIZE = 500
+
+# Accepted column headings (case-insensitive) and the form field each one
+# fills.  The export's headings are accepted, so an export can be edited
+# and imported back.
+IMPORT_COLUMNS = {
+    'item': 'name',
+    'name': 'name',
+    'status': 'stat',
+    'description': 'description',
+    'location': 'item_location',
+    'area': 'item_area',
+    'mfg': 'mfg',
+    'manufacturer': 'mfg',
+    'model #': 'model_no',
+    'model_no': 'model_no',
+    'serial #': 'serial_no',
+    'serial_no': 'serial_no',
+    'qty': 'qty',
+    'total cost': 'total_cost',
+    'total_cost': 'total_cost',
+    'assigned to': 'assigned_to',
+    'assigned_to': 'assigned_to',
+    'approved by': 'approved_by',
+    'approved_by': 'approved_by',
+    'approval date': 'approved_date',
+    'approved date': 'approved_date',
+    'approved_date': 'approved_date',
+    'purchase date': 'purchase_date',
+    'purchase_date': 'purchase_date',
+}
+
+LOOKUP_LABELS = {
+    'stat': 'status',
+    'item_location': 'location',
+    'item_area': 'area',
+    'mfg': 'manufacturer',
+    'assigned_to': 'assignee',
+    'approved_by': 'approver',
+}
+
+
+class ImportItemForm(InventoryForm):
+    """InventoryForm for bulk imports.
+
+    Item names and serial numbers are checked for duplicates once per
+    batch (see import_items) rather than with a query per row.
+    """
+
+    def validate_unique(self):
+        pass
+
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        exclude.add('serial_no')
+        return exclude
+
+
+class ImportResult:
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+
+    @property
+    def valid(self):
+        return self.rows - len(self.errors)
+
+    def add_error(self, line, name, messages):
+        self.errors.append((line, name, messages))
+
+    def error_report(self):
+        """Yields the per-row errors as CSV lines."""
+        writer = csv.writer(Echo())
+        yield writer.writerow(['Row', 'Item', 'Errors'])
+        for line, name, messages in self.errors:
+            yield writer.writerow([line, name, '; '.join(messages)])
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _read_rows(header, rows, first_line):
+    fields = [IMPORT_COLUMNS.get(str(h or '').strip().lower()) for h in header]
+    if not any(fields):
+        raise ValueError('No recognised column headings were found.')
+    for line, values in enumerate(rows, start=first_line):
+        row = {}
+        for field, value in zip(fields, values):
+            if field:
+                row[field] = _cell(value)
+        if any(value != '' for value in row.values()):
+            yield line, row
+
+
+def read_csv(upload):
+    """Yields ``(line number, {field: value})`` from a CSV upload."""
+    text = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    header = next(reader, [])
+    yield from _read_rows(header, reader, 2)
+
+
+def read_xlsx(upload):
+    """Yields ``(line number, {field: value})`` from the first sheet."""
+    workbook = load_workbook(upload, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        yield from _read_rows(header, rows, 2)
+    finally:
+        workbook.close()
+
+
+def read_upload(upload, file_name):
+    if file_name.lower().endswith('.xlsx'):
+        return read_xlsx(upload)
+    return read_csv(upload)
+
+
+def _resolve_names(batch):
+    """Maps each lookup name in ``batch`` to its id, one query per table."""
+    names = {field: set() for field in LOOKUP_MODELS}
+    for _, row in batch:
+        for field in LOOKUP_MODELS:
+            if row.get(field):
+                names[field].add(row[field])
+
+    resolved = {}
+    for field, model in LOOKUP_MODELS.items():
+        if field == 'item_area':
+            continue
+        resolved[field] = dict(
+            model.objects.filter(
+                name__in=names[field]
+            ).values_list('name', 'id')
+        )
+
+    # Area names repeat across locations, so they resolve per location
+    resolved['item_area'] = {
+        (map_loc_id, name): pk
+        for pk, name, map_loc_id in Area.objects.filter(
+            name__in=names['item_area'],
+            map_loc_id__in=resolved['item_location'].values()
+        ).values_list('id', 'name', 'map_loc_id')
+    }
+    return resolved
+
+
+def _form_data(row, resolved):
+    """Swaps the lookup names in ``row`` for their ids.
+
+    Returns the form data and ``{field: error}`` for names that did not
+    resolve.
+    """
+    data = dict(row)
+    unresolved = {}
+    for field, label in LOOKUP_LABELS.items():
+        name = row.get(field)
+        if not name:
+            data[field] = ''
+            continue
+        if field == 'item_area':
+            key = (data.get('item_location'), name)
+        else:
+            key = name
+        pk = resolved[field].get(key)
+        if pk is None:
+            unresolved[field] = f'Unknown {label} "{name}".'
+        data[field] = pk or ''
+    return data, unresolved
+
+
+def import_items(rows, user, dry_run=False, batch_size=BATCH_SIZE):
+    """Validates and inserts inventory rows a batch at a time.
+
+    ``rows`` yields ``(line number, {field: value})``.  Each batch resolves
+    its lookup names with one query per table, is checked against
+    InventoryForm's rules and is inserted with bulk_create in its own
+    transaction.  With ``dry_run`` nothing is written.
+    """
+    result = ImportResult(dry_run)
+    seen_names = set()
+    seen_serials = set()
+
+    batch = []
+    for line, row in rows:
+        batch.append((line, row))
+        if len(batch) == batch_size:
+            _import_batch(batch, user, result, seen_names, seen_serials)
+            batch = []
+    if batch:
+        _import_batch(batch, user, result, seen_names, seen_serials)
+    return result
+
+
+def _import_batch(batch, user, result, seen_names, seen_serials):
+    resolved = _resolve_names(batch)
+    names = [row.get('name') for _, row in batch if row.get('name')]
+    serials = [
+        str(row['serial_no']).upper()
+        for _, row in batch if row.get('serial_no')
+    ]
+    existing_names = set(
+        InventoryItem.objects.filter(
+            name__in=names
+        ).values_list('name', flat=True)
+    )
+    existing_serials = set(
+        InventoryItem.objects.annotate(
+            serial_upper=Upper('serial_no')
+        ).filter(
+            serial_no__isnull=False,
+            serial_upper__in=serials
+        ).values_list('serial_upper', flat=True)
+    )
+
+    now = datetime.datetime.now(tz=EST)
+    items = []
+    for line, row in batch:
+        result.rows += 1
+        data, unresolved = _form_data(row, resolved)
+        errors = list(unresolved.values())
+        form = ImportItemForm(data)
+        if not form.is_valid():
+            for field, field_errors in form.errors.items():
+                if field in unresolved:
+                    continue
+                label = '' if field == '__all__' else f'{field}: '
+                errors.extend(label + e for e in field_errors)
+
+        name = row.get('name', '')
+        if name in existing_names or name in seen_names:
+            errors.append(f'An item named "{name}" already exists.')
+        serial = str(row.get('serial_no') or '').upper()
+        if serial and (serial in existing_serials or serial in seen_serials):
+            errors.append(f'Serial number "{serial}" already exists.')
+
+        if errors:
+            result.add_error(line, name, errors)
+            continue
+
+        seen_names.add(name)
+        if serial:
+            seen_serials.add(serial)
+
+        item = form.save(commit=False)
+        item.model_no = item.model_no.upper()
+        item.serial_no = serial or None
+        item.inserted_by = user
+        item.inserted_date = now
+        items.append(item)
+
+    if items and not result.dry_run:
+        with transaction.atomic():
+            InventoryItem.objects.bulk_create(items)
+            record_created(items)
+            log_item_changes(
+                [item.pk for item in items], ChangeLog.Action.CREATE
+            )
+        result.created += len(items)
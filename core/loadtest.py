@@ -0,0 +1,348 @@
+import http.cookiejar
+import random
+import re
+import socketserver
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY,
+    HASH_SESSION_KEY,
+    SESSION_KEY
+)
+from django.contrib.sessions.backends.db import SessionStore
+
+
+# Pieces of the load harness (see the load_test command): an SMTP sink
+# standing in for the mail server, virtual users that replay what people
+# do in the app over real HTTP, and the latency bookkeeping.
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.reply('220 loadtest SMTP sink')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply('250 loadtest')
+            elif command == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                self.server.received()
+                self.reply('250 OK')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            elif command in (b'MAIL', b'RCPT', b'RSET', b'NOOP'):
+                self.reply('250 OK')
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """Accepts and counts mail on a free local port; delivers nothing."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SmtpHandler)
+        self.messages = 0
+        self._lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def received(self):
+        with self._lock:
+            self.messages += 1
+
+
+def session_key(user):
+    """A logged-in session for ``user``, as its cookie value.
+
+    The login form's reCAPTCHA is checked with Google, so virtual users
+    start from a session made here rather than by posting the form.
+    """
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return session.session_key
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(int(round(fraction * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class Recorder:
+    """Collects request latencies and failures per endpoint label."""
+
+    def __init__(self):
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, label, seconds, ok):
+        with self._lock:
+            if ok:
+                self.timings[label].append(seconds)
+            else:
+                self.errors[label] += 1
+
+    def report(self, elapsed):
+        """One row per label: counts, throughput and latency in ms."""
+        rows = []
+        for label in sorted(set(self.timings) | set(self.errors)):
+            ordered = sorted(self.timings[label])
+            rows.append({
+                'endpoint': label,
+                'requests': len(ordered),
+                'errors': self.errors[label],
+                'rps': round(len(ordered) / elapsed, 2),
+                'p50_ms': round(percentile(ordered, 0.50) * 1000, 1),
+                'p95_ms': round(percentile(ordered, 0.95) * 1000, 1),
+                'p99_ms': round(percentile(ordered, 0.99) * 1000, 1),
+                'max_ms': round((ordered[-1] if ordered else 0) * 1000, 1),
+            })
+        return rows
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Time a POST on its own, not together with the page it redirects to
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class VirtualUser:
+    """One logged-in browser session replaying scenarios."""
+
+    def __init__(self, base_url, account, items, recorder, rng, stop_at):
+        self.base_url = base_url
+        self.email = account['email']
+        self.stop_at = stop_at
+        self.items = items
+        self.recorder = recorder
+        self.rng = rng
+        self.cookies = http.cookiejar.CookieJar()
+        self.cookies.set_cookie(_cookie(
+            settings.SESSION_COOKIE_NAME, account['session'], base_url
+        ))
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect()
+        )
+
+    def request(self, label, path, data=None, headers=None, opener=None,
+                status=None):
+        """Fetches ``path`` (POSTing ``data`` if given) and records how
+        long the whole response took.  Returns the body, or None on
+        failure.
+
+        A POST succeeds only with ``status``, by default a 302: a form
+        that comes back with errors (200) saved nothing.
+        """
+        if status is None and data is not None:
+            status = 302
+        url = self.base_url + path
+        headers = dict(headers or {})
+        body = None
+        if data is not None:
+            data = dict(data, csrfmiddlewaretoken=self.csrf_token())
+            headers['X-CSRFToken'] = data['csrfmiddlewaretoken']
+            body = urllib.parse.urlencode(data).encode()
+        start = time.perf_counter()
+        try:
+            with (opener or self.opener).open(
+                urllib.request.Request(url, body, headers), timeout=120
+            ) as response:
+                content = response.read()
+            ok = status is None or response.status == status
+        except urllib.error.HTTPError as e:
+            content = e.read()
+            if status is None:
+                ok = 300 <= e.code < 400
+            else:
+                ok = e.code == status
+        except OSError:
+            content = None
+            ok = False
+        self.recorder.record(label, time.perf_counter() - start, ok)
+        return content if ok else None
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == settings.CSRF_COOKIE_NAME:
+                return cookie.value
+        return ''
+
+    # Scenarios
+
+    def login(self):
+        # A fresh browser: no session, so the login page itself is served
+        anonymous = urllib.request.build_opener(_NoRedirect())
+        self.request('login page', '/accounts/login/', opener=anonymous)
+
+    def browse(self):
+        self.request('inventory', '/core/inventory')
+        start = self.rng.randrange(0, 500, 25)
+        self.request(
+            'inventory data',
+            f'/core/inventory/data?draw=1&start={start}&length=25'
+        )
+        if self.rng.random() < 0.3:
+            self.request('dashboard', '/core/dashboard')
+
+    def filter(self):
+        item = self.rng.choice(self.items)
+        params = {
+            'draw': 1,
+            'start': 0,
+            'length': 25,
+            'search[value]': item['name'].split()[0],
+            'columns[4][search][value]': item['location'],
+            'order[0][column]': 14,
+            'order[0][dir]': 'desc',
+        }
+        self.request(
+            'inventory data (filtered)',
+            '/core/inventory/data?' + urllib.parse.urlencode(params)
+        )
+
+    def edit(self):
+        item = self.rng.choice(self.items)
+        path = f'/core/edit_item/{item["id"]}'
+        if self.request('edit item', path) is not None:
+            self.request('edit item (save)', path, data=item['form'])
+
+    def note(self):
+        item = self.rng.choice(self.items)
+        path = f'/core/notes/{item["id"]}'
+        if self.request('notes', path) is not None:
+            self.request('notes (add)', path, data={
+                'comment': f'Load test note {self.rng.randrange(10 ** 6)}'
+            })
+
+    def export(self):
+        item = self.rng.choice(self.items)
+        self.request(
+            'export csv',
+            '/core/export_to_excel?' + urllib.parse.urlencode({
+                'format': 'csv',
+                'columns[4][search][value]': item['location'],
+            })
+        )
+
+    def password_reset(self):
+        # Mails the reset link to the SMTP sink
+        path = '/accounts/password-reset/'
+        if self.request('password reset', path) is not None:
+            self.request(
+                'password reset (send)', path, data={'email': self.email}
+            )
+
+    def export_job(self):
+        """Queues a background export and polls until the worker is done;
+        the whole round trip is recorded as well as each request.  A job
+        still running when the stage ends counts as a failure."""
+        self.request('inventory', '/core/inventory')
+        start = time.perf_counter()
+        content = self.request(
+            'export job (start)',
+            '/core/exports/start',
+            data={'file_format': 'csv', 'query': ''},
+            headers={'HX-Request': 'true'},
+            # HTMX gets the job's row rather than a redirect
+            status=200
+        )
+        match = content and re.search(rb'export-job-(\d+)', content)
+        if not match:
+            return
+        status_path = f'/core/exports/{int(match.group(1))}/status'
+        while time.perf_counter() < self.stop_at:
+            time.sleep(0.5)
+            content = self.request('export job (status)', status_path)
+            if content is None:
+                break
+            if b'hx-trigger' not in content:
+                self.recorder.record(
+                    'export job (end to end)',
+                    time.perf_counter() - start,
+                    b'Done' in content
+                )
+                return
+        self.recorder.record('export job (end to end)', 0, False)
+
+
+# Scenario -> weight: mostly reading the table, some writes and exports
+SCENARIOS = {
+    'browse': 40,
+    'filter': 25,
+    'note': 10,
+    'edit': 10,
+    'login': 5,
+    'export': 5,
+    'export_job': 5,
+    'password_reset': 2,
+}
+
+
+def _cookie(name, value, base_url):
+    host = urllib.parse.urlsplit(base_url).hostname
+    return http.cookiejar.Cookie(
+        0, name, value, None, False, host, False, False, '/', True, False,
+        None, False, None, None, {}
+    )
+
+
+def run_stage(base_url, accounts, items, users, duration, think, seed):
+    """Runs ``users`` virtual users for ``duration`` seconds.
+
+    ``accounts`` are ``{'session', 'email'}`` dicts the users log in as.
+
+    Returns ``(recorder, elapsed seconds)``.
+    """
+    recorder = Recorder()
+    names = list(SCENARIOS)
+    weights = list(SCENARIOS.values())
+    stop_at = time.perf_counter() + duration
+
+    def run(index):
+        rng = random.Random(seed * 100003 + index)
+        user = VirtualUser(
+            base_url, accounts[index % len(accounts)], items, recorder, rng,
+            stop_at
+        )
+        # Stagger the start so the users do not move in lockstep
+        time.sleep(rng.uniform(0, min(think * 2, 1)))
+        while time.perf_counter() < stop_at:
+            getattr(user, rng.choices(names, weights=weights)[0])()
+            time.sleep(rng.uniform(0, think * 2))
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=run, args=(index,), daemon=True)
+        for index in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - start
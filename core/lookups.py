@@ -0,0 +1,130 @@
+from django.core.cache import cache
+
+from .models import (
+    ApprovalList,
+    Area,
+    Assignee,
+    ItemStatus,
+    Manufacturer,
+    MapLocation
+)
+from .versions import VersionMarker
+
+
+# Reference tables behind the add/edit item forms, keyed by the
+# InventoryItem field that points at them.  They change rarely, so their
+# rows are cached in-process and in the shared cache, and any save or
+# delete bumps LOOKUPS_VERSION (see core.signals) to invalidate every copy.
+LOOKUP_MODELS = {
+    'stat': ItemStatus,
+    'item_location': MapLocation,
+    'item_area': Area,
+    'mfg': Manufacturer,
+    'assigned_to': Assignee,
+    'approved_by': ApprovalList,
+}
+
+LOOKUP_VALUES = {
+    'item_area': ('id', 'name', 'map_loc_id'),
+}
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+LOOKUPS_VERSION = VersionMarker('lookups')
+
+_local = {}
+
+
+def lookups_version():
+    return LOOKUPS_VERSION.version()
+
+
+def lookups_modified():
+    """When the lookups last changed, or None if that is not known."""
+    return LOOKUPS_VERSION.modified()
+
+
+def bump_lookups_version():
+    LOOKUPS_VERSION.bump()
+
+
+def _load():
+    lookups = {}
+    for name, model in LOOKUP_MODELS.items():
+        fields = LOOKUP_VALUES.get(name, ('id', 'name'))
+        lookups[name] = tuple(
+            model.objects.order_by('name', 'id').values(*fields)
+        )
+    return lookups
+
+
+def _current():
+    version = lookups_version()
+    state = _local.get('state')
+    if state is not None and state[0] == version:
+        return state
+
+    key = f'lookups:{version}'
+    lookups = cache.get(key)
+    if lookups is None:
+        lookups = _load()
+        cache.set(key, lookups, timeout=CACHE_TIMEOUT)
+
+    index = {
+        name: {row['id']: row for row in rows}
+        for name, rows in lookups.items()
+    }
+    areas_by_location = {}
+    for row in lookups['item_area']:
+        areas_by_location.setdefault(row['map_loc_id'], []).append(row)
+
+    # Swapped in as one tuple so other threads never see a torn update
+    state = (version, lookups, index, areas_by_location)
+    _local['state'] = state
+    return state
+
+
+def get_lookups():
+    """Returns every lookup table as ``{field name: (row dicts, ...)}``.
+
+    Rows are ordered by name.  A warm process answers with a single shared
+    cache read and no queries.
+    """
+    return _current()[1]
+
+
+def get_lookup(name):
+    return get_lookups()[name]
+
+
+def lookup_row(name, pk):
+    """Returns the cached row of lookup ``name`` with primary key ``pk``."""
+    return _current()[2][name].get(pk)
+
+
+def lookup_except(name, pk):
+    """Returns the rows of lookup ``name`` other than ``pk``."""
+    return [row for row in get_lookup(name) if row['id'] != pk]
+
+
+def areas_for_location(location_id):
+    return _current()[3].get(location_id, [])
+
+
+def location_tree():
+    """Returns every MapLocation with its areas nested under it."""
+    version, lookups, _, areas_by_location = _current()
+    return {
+        'version': version,
+        'locations': [
+            {
+                'id': location['id'],
+                'name': location['name'],
+                'areas': [
+                    {'id': area['id'], 'name': area['name']}
+                    for area in areas_by_location.get(location['id'], [])
+                ],
+            }
+            for location in lookups['item_location']
+        ],
+    }
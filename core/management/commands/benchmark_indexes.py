@@ -0,0 +1,166 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Index
+from django.db.models.functions import Upper
+
+from core.datatables import ROW_VALUES, order_inventory
+from core.models import InventoryItem
+from core.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway test database with inventory items and compares '
+        'query plans and timings for the hot InventoryItem queries with and '
+        'without the indexes added in migration 0017.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=200000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Reuse (and keep) the test database between runs.'
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Use EXPLAIN ANALYZE (PostgreSQL only).'
+        )
+        parser.add_argument('--json', help='Also write the results here.')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb']
+        )
+        try:
+            existing = InventoryItem.objects.count()
+            if existing < options['items']:
+                self.stdout.write(
+                    f'Seeding {options["items"] - existing} items...'
+                )
+                generate(
+                    {'items': options['items'] - existing, 'notes': 0},
+                    seed=options['seed']
+                )
+            results = self.compare(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def compare(self, options):
+        queries = benchmark_queries()
+        model = InventoryItem
+        indexes = model._meta.indexes
+        constraints = model._meta.constraints
+        # Before 0017, stat had its own foreign-key index
+        stat_index = Index(fields=['stat'], name='inv_benchmark_stat_idx')
+
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.remove_index(model, index)
+            for constraint in constraints:
+                editor.remove_constraint(model, constraint)
+            editor.add_index(model, stat_index)
+        before = self.measure(queries, options)
+
+        with connection.schema_editor() as editor:
+            editor.remove_index(model, stat_index)
+            for index in indexes:
+                editor.add_index(model, index)
+            for constraint in constraints:
+                editor.add_constraint(model, constraint)
+        after = self.measure(queries, options)
+
+        results = {
+            'vendor': connection.vendor,
+            'items': InventoryItem.objects.count(),
+            'queries': [],
+        }
+        for name, _ in queries:
+            results['queries'].append({
+                'name': name,
+                'before': before[name],
+                'after': after[name],
+            })
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, result in (('before', before), ('after', after)):
+                self.stdout.write(
+                    f'  {label}: median {result[name]["median_ms"]:.2f} ms'
+                )
+                for line in result[name]['plan'].splitlines():
+                    self.stdout.write(f'    {line}')
+        return results
+
+    def measure(self, queries, options):
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {InventoryItem._meta.db_table}')
+
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options['analyze'] = True
+
+        results = {}
+        for name, queryset in queries:
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = {
+                'median_ms': statistics.median(timings),
+                'min_ms': min(timings),
+                'plan': queryset.explain(**explain_options),
+            }
+        return results
+
+
+def benchmark_queries():
+    """The hot queries, built with sample values from the seeded data."""
+    sample = InventoryItem.objects.exclude(serial_no=None).order_by('id')[
+        InventoryItem.objects.count() // 2
+    ]
+    return [
+        (
+            'inventory table, default order',
+            order_inventory(InventoryItem.objects.all(), {}).values(
+                *ROW_VALUES
+            )[:10],
+        ),
+        (
+            'serial_no lookup',
+            # Repeats the partial index's condition so it can be used
+            InventoryItem.objects.annotate(
+                serial_upper=Upper('serial_no')
+            ).filter(
+                serial_no__isnull=False,
+                serial_upper=sample.serial_no.upper()
+            ).values('id'),
+        ),
+        (
+            'model_no lookup',
+            InventoryItem.objects.filter(
+                model_no=sample.model_no
+            ).values('id'),
+        ),
+        (
+            'status + location, newest first',
+            InventoryItem.objects.filter(
+                stat_id=sample.stat_id,
+                item_location_id=sample.item_location_id
+            ).order_by('-purchase_date', 'id').values('id')[:25],
+        ),
+    ]
+
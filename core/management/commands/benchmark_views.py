@@ -0,0 +1,421 @@
+import itertools
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment
+)
+from django.urls import reverse
+
+from core.models import InventoryItem, User
+from core.querybudget import QueryCounter
+from core.synthetic import generate
+
+
+# A time or memory figure counts as a regression only when it is over the
+# baseline by more than the tolerance *and* by more than these, so that
+# sub-millisecond views do not fail on scheduler noise
+NOISE_MS = 1.0
+NOISE_KB = 64
+
+VIEWS = (
+    'inventory',
+    'inventory_data',
+    'export_to_excel',
+    'add_item GET',
+    'add_item POST',
+    'edit_item GET',
+    'edit_item POST',
+    'notes',
+    'load_areas',
+    'check_username',
+    'check_email',
+)
+
+# Status each view must answer with; a form that comes back with errors
+# (200) has not saved anything, so its timings would be misleading
+EXPECTED_STATUS = {
+    'add_item POST': 302,
+    'edit_item POST': 302,
+}
+
+# Timings depend on the machine, so they are only compared (and saved in
+# the baseline) with --check-time, against a baseline recorded on the
+# same machine
+TIME_FIELDS = ('median_ms', 'min_ms')
+
+
+def default_baseline():
+    return os.path.join(
+        settings.BASE_DIR, 'benchmarks', f'views-{connection.vendor}.json'
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway test database with synthetic data, drives the main '
+        'views through the test client and records wall time, query count '
+        'and peak memory for each. Compares the query counts and memory '
+        '(and with --check-time the timings) with a JSON baseline and fails '
+        'if any view got worse by more than the tolerance.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--view',
+            action='append',
+            choices=VIEWS,
+            help='Only benchmark this view (may be repeated).'
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Reuse (and keep) the test database between runs.'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Baseline file (default benchmarks/views-<vendor>.json).'
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Write the results as the new baseline instead of comparing.'
+        )
+        parser.add_argument(
+            '--check-time',
+            action='store_true',
+            help='Also save and compare wall times. Only meaningful against '
+                 'a baseline recorded on this machine.'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Allowed relative increase in time and memory.'
+        )
+        parser.add_argument(
+            '--query-tolerance',
+            type=int,
+            default=0,
+            help='Allowed increase in query count.'
+        )
+        parser.add_argument('--json', help='Also write the results here.')
+
+    def handle(self, *args, **options):
+        baseline_path = options['baseline'] or default_baseline()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb']
+        )
+        setup_test_environment()
+        # A private cache, so the shared one neither serves rows from the
+        # real database nor keeps the benchmark's
+        local_cache = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'benchmark-views',
+            }
+        }
+        try:
+            # Every request comes from one client, which the availability
+            # checks' rate limit would turn away
+            with override_settings(
+                CACHES=local_cache, RATE_LIMIT_ENABLED=False
+            ):
+                existing = InventoryItem.objects.count()
+                if existing < options['items']:
+                    self.stdout.write(
+                        f'Seeding {options["items"] - existing} items...'
+                    )
+                    generate(
+                        {
+                            'items': options['items'] - existing,
+                            'notes': (options['items'] - existing) // 2,
+                        },
+                        seed=options['seed']
+                    )
+                results = self.run_views(options)
+        finally:
+            teardown_test_environment()
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(baseline_path) or '.', exist_ok=True)
+            with open(baseline_path, 'w') as f:
+                json.dump(
+                    baseline_results(results, options['check_time']),
+                    f,
+                    indent=2
+                )
+            self.stdout.write(f'Baseline written to {baseline_path}.')
+            return
+
+        if not os.path.exists(baseline_path):
+            self.stdout.write(
+                f'No baseline at {baseline_path}; run with --save-baseline '
+                'to create one.'
+            )
+            return
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if (baseline['vendor'], baseline['items']) != (
+            results['vendor'], results['items']
+        ):
+            raise CommandError(
+                f'{baseline_path} was recorded with {baseline["items"]} items '
+                f'on {baseline["vendor"]}; rerun with --items '
+                f'{baseline["items"]} or save a new baseline.'
+            )
+        if options['check_time'] and not any(
+            'median_ms' in view for view in baseline['views'].values()
+        ):
+            self.stdout.write(
+                f'{baseline_path} has no timings; save a baseline with '
+                '--check-time on this machine to compare them.'
+            )
+        regressions = compare(results, baseline, options)
+        if regressions:
+            for line in regressions:
+                self.stderr.write(line)
+            raise CommandError(
+                f'{len(regressions)} regressions against {baseline_path}.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'No regressions against {baseline_path}.'
+        ))
+
+    def run_views(self, options):
+        client = Client()
+        user, _ = User.objects.get_or_create(
+            username='benchmark',
+            defaults={
+                'first_name': 'Bench',
+                'last_name': 'Mark',
+                'is_staff': True,
+            }
+        )
+        client.force_login(user)
+
+        scenarios = view_scenarios()
+        names = options['view'] or VIEWS
+        results = {
+            'vendor': connection.vendor,
+            'items': options['items'],
+            'repeat': options['repeat'],
+            'views': {},
+        }
+        for name in names:
+            result = measure(
+                client,
+                scenarios[name],
+                options['repeat'],
+                EXPECTED_STATUS.get(name, 200)
+            )
+            results['views'][name] = result
+            self.stdout.write(
+                f'{name:<16} {result["median_ms"]:9.2f} ms  '
+                f'{result["queries"]:4d} queries  '
+                f'{result["peak_kb"]:9.1f} KB'
+            )
+        return results
+
+
+def view_scenarios():
+    """View name -> callable returning the next ``(method, path, data)``.
+
+    POSTs that create rows get fresh values on every call.
+    """
+    middle = InventoryItem.objects.count() // 2
+    item = InventoryItem.objects.select_related(
+        'item_location'
+    ).order_by('id')[middle]
+    noted = InventoryItem.objects.order_by('-note_count', 'id').first()
+    taken = User.objects.order_by('id').first()
+    counter = itertools.count(1)
+
+    def item_data(**changes):
+        data = {
+            'name': item.name,
+            'stat': item.stat_id,
+            'description': item.description,
+            'item_location': item.item_location_id,
+            'item_area': item.item_area_id,
+            'mfg': item.mfg_id,
+            'model_no': item.model_no,
+            'serial_no': item.serial_no or '',
+            'qty': item.qty,
+            'total_cost': item.total_cost or '',
+            'assigned_to': item.assigned_to_id or '',
+            'approved_by': item.approved_by_id,
+            'approved_date': item.approved_date,
+            'purchase_date': item.purchase_date,
+        }
+        data.update(changes)
+        return data
+
+    def new_item():
+        number = next(counter)
+        return 'post', reverse('core:add_item'), item_data(
+            name=f'Benchmark item {number}',
+            serial_no=f'BENCH{number:08d}'
+        )
+
+    edit_path = reverse('core:edit_item', args=[item.pk])
+    return {
+        'inventory': lambda: ('get', reverse('core:inventory'), None),
+        # The table's rows: a global search, a column filter and a sort on
+        # something other than the default order
+        'inventory_data': lambda: (
+            'get',
+            reverse('core:inventory_data'),
+            {
+                'draw': 1,
+                'start': 0,
+                'length': 25,
+                'search[value]': item.name.split()[0],
+                'columns[4][search][value]': item.item_location.name,
+                'order[0][column]': 2,
+                'order[0][dir]': 'asc',
+            }
+        ),
+        'export_to_excel': lambda: (
+            'get', reverse('core:export_to_excel'), {'format': 'csv'}
+        ),
+        'add_item GET': lambda: ('get', reverse('core:add_item'), None),
+        'add_item POST': new_item,
+        'edit_item GET': lambda: ('get', edit_path, None),
+        'edit_item POST': lambda: ('post', edit_path, item_data()),
+        'notes': lambda: (
+            'get', reverse('core:notes', args=[noted.pk]), None
+        ),
+        'load_areas': lambda: (
+            'get',
+            reverse('core:load_areas'),
+            {'item_location': item.item_location_id}
+        ),
+        'check_username': lambda: (
+            'post',
+            reverse('core:check_username'),
+            {'username': taken.username}
+        ),
+        'check_email': lambda: (
+            'post', reverse('core:check_email'), {'email': taken.email}
+        ),
+    }
+
+
+def _request(client, scenario, status):
+    method, path, data = scenario()
+    response = getattr(client, method)(path, data)
+    if response.status_code != status:
+        raise CommandError(
+            f'{method.upper()} {path} returned {response.status_code}, '
+            f'not {status}.'
+        )
+    # Streamed exports do their work while being read
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    else:
+        response.content
+    response.close()
+
+
+def measure(client, scenario, repeat, status=200):
+    """Median wall time, query count and peak traced memory of a view."""
+    _request(client, scenario, status)  # warm caches
+
+    timings = []
+    queries = []
+    for _ in range(repeat):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            _request(client, scenario, status)
+        timings.append((time.perf_counter() - start) * 1000)
+        queries.append(counter.count)
+
+    # Tracing slows everything down, so memory gets a run of its own
+    tracemalloc.start()
+    try:
+        _request(client, scenario, status)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'queries': max(queries),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def baseline_results(results, with_time):
+    """``results`` as saved for a baseline, without timings unless
+    ``with_time``."""
+    if with_time:
+        return results
+    return {
+        **results,
+        'views': {
+            name: {
+                key: value
+                for key, value in result.items()
+                if key not in TIME_FIELDS
+            }
+            for name, result in results['views'].items()
+        },
+    }
+
+
+def compare(results, baseline, options):
+    """Lines describing each metric that regressed past the tolerance."""
+    tolerance = 1 + options['tolerance']
+    regressions = []
+    for name, result in results['views'].items():
+        old = baseline.get('views', {}).get(name)
+        if old is None:
+            continue
+        if (
+            options['check_time']
+            and 'median_ms' in old
+            and result['median_ms'] > old['median_ms'] * tolerance
+            and result['median_ms'] - old['median_ms'] > NOISE_MS
+        ):
+            regressions.append(
+                f'{name}: median {result["median_ms"]:.2f} ms, baseline '
+                f'{old["median_ms"]:.2f} ms'
+            )
+        if result['queries'] > old['queries'] + options['query_tolerance']:
+            regressions.append(
+                f'{name}: {result["queries"]} queries, baseline '
+                f'{old["queries"]}'
+            )
+        if (
+            result['peak_kb'] > old['peak_kb'] * tolerance
+            and result['peak_kb'] - old['peak_kb'] > NOISE_KB
+        ):
+            regressions.append(
+                f'{name}: peak {result["peak_kb"]:.1f} KB, baseline '
+                f'{old["peak_kb"]:.1f} KB'
+            )
+    return regressions
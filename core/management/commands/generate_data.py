@@ -0,0 +1,60 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.synthetic import BATCH_SIZE, DEFAULT_COUNTS, generate
+
+
+class Command(BaseCommand):
+    help = (
+        'Adds deterministic synthetic inventory data (locations, areas, '
+        'manufacturers, assignees, approvers, users, items and notes) for '
+        'local load and performance testing.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_COUNTS.items():
+            parser.add_argument(
+                f'--{name}',
+                type=int,
+                default=default,
+                help=f'Number of {name} to add (default {default}).'
+            )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--until',
+            type=datetime.date.fromisoformat,
+            default=datetime.date(2025, 12, 31),
+            help='Latest purchase and insert date (YYYY-MM-DD).'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        counts = {name: options[name] for name in DEFAULT_COUNTS}
+        if any(count < 0 for count in counts.values()):
+            raise CommandError('Counts cannot be negative.')
+        start = time.perf_counter()
+
+        def progress(written):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{written}/{counts["items"]} items ({elapsed:.0f}s)'
+            )
+
+        try:
+            generate(
+                counts,
+                seed=options['seed'],
+                until=options['until'],
+                batch_size=options['batch_size'],
+                progress=progress if options['verbosity'] > 0 else None
+            )
+        except ValueError as e:
+            raise CommandError(e)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{count} {name}' for name, count in counts.items())
+            + f' added in {elapsed:.1f}s.'
+        ))
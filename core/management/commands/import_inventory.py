@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import BATCH_SIZE, import_items, read_upload
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports inventory items from a CSV or Excel (.xlsx) file. Rows '
+        'that fail validation are skipped and listed in the error report.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Username recorded as the inserter of the new items.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file without writing anything.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--errors',
+            help='Write the per-row error report to this CSV file.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'No user named "{options["user"]}".')
+
+        with open(options['path'], 'rb') as f:
+            try:
+                result = import_items(
+                    read_upload(f, options['path']),
+                    user,
+                    dry_run=options['dry_run'],
+                    batch_size=options['batch_size']
+                )
+            except ValueError as e:
+                raise CommandError(f'{options["path"]}: {e}')
+
+        if options['errors'] and result.errors:
+            with open(options['errors'], 'w', newline='') as f:
+                f.writelines(result.error_report())
+
+        for line, name, messages in result.errors[:20]:
+            self.stderr.write(f'Row {line} ({name}): {"; ".join(messages)}')
+        if len(result.errors) > 20:
+            self.stderr.write(f'... and {len(result.errors) - 20} more')
+
+        summary = (
+            f'{result.rows} rows, {result.valid} valid, '
+            f'{len(result.errors)} with errors'
+        )
+        if result.dry_run:
+            self.stdout.write(f'Dry run: {summary}. Nothing was imported.')
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'{summary}, {result.created} imported.')
+            )
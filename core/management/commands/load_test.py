@@ -0,0 +1,286 @@
+import importlib.util
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from core.loadtest import SmtpSink, run_stage, session_key
+from core.models import InventoryItem, User
+from core.synthetic import generate
+
+
+ITEM_POOL = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Starts the app under gunicorn (or runserver if gunicorn is not '
+        'installed) with a Celery worker, against a seeded throwaway '
+        'database and local stand-ins for the broker, result backend, '
+        'cache and SMTP server, then replays user scenarios at each '
+        'concurrency level and reports throughput and p50/p95/p99 latency '
+        'per endpoint. Use PostgreSQL for meaningful numbers: SQLite runs '
+        'one write at a time and background exports can fail there with '
+        '"database is locked".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            default='5,10,20',
+            help='Comma-separated concurrency levels to run in turn.'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Seconds to run each concurrency level.'
+        )
+        parser.add_argument(
+            '--think',
+            type=float,
+            default=0.5,
+            help='Mean pause between a user\'s scenarios, in seconds.'
+        )
+        parser.add_argument('--items', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--threads', type=int, default=1)
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Reuse (and keep) the test database between runs.'
+        )
+        parser.add_argument('--json', help='Also write the results here.')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(n) for n in options['users'].split(',') if n]
+        except ValueError:
+            raise CommandError('--users must be comma-separated numbers.')
+        if not levels or min(levels) < 1:
+            raise CommandError('--users needs at least one level above 0.')
+
+        run_dir = tempfile.mkdtemp(prefix='loadtest-')
+        for name in ('broker', 'results', 'cache', 'exports', 'metrics'):
+            os.makedirs(os.path.join(run_dir, name))
+        smtp = SmtpSink()
+        threading.Thread(target=smtp.serve_forever, daemon=True).start()
+
+        old_name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            # The server processes need a file, not an in-memory database
+            connection.settings_dict['TEST']['NAME'] = os.path.join(
+                run_dir, 'db.sqlite3'
+            )
+        db_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb']
+        )
+        if connection.vendor == 'sqlite':
+            # Readers and the one writer stop blocking each other; without
+            # this a long export holds up every write behind it
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=WAL')
+        processes = []
+        try:
+            # Seed through the same cache the servers will use
+            with override_settings(CACHES={
+                'default': {
+                    'BACKEND': (
+                        'django.core.cache.backends.filebased.FileBasedCache'
+                    ),
+                    'LOCATION': os.path.join(run_dir, 'cache'),
+                }
+            }):
+                accounts, items = self.prepare(options, max(levels))
+
+            port = _free_port()
+            env = dict(
+                os.environ,
+                DJANGO_SETTINGS_MODULE='proj.settings_loadtest',
+                LOADTEST_BASE_SETTINGS=settings.SETTINGS_MODULE,
+                LOADTEST_DIR=run_dir,
+                LOADTEST_DB_NAME=str(db_name),
+                LOADTEST_SMTP_PORT=str(smtp.port),
+                PROMETHEUS_MULTIPROC_DIR=os.path.join(run_dir, 'metrics'),
+            )
+            processes.append(self.start_server(port, env, options))
+            processes.append(subprocess.Popen([
+                sys.executable, '-m', 'celery', '-A', 'proj', 'worker',
+                '--pool', 'threads', '--concurrency', '2',
+                '--without-gossip', '--without-mingle',
+                '--without-heartbeat', '--loglevel', 'warning',
+            ], cwd=settings.BASE_DIR, env=env))
+            base_url = f'http://127.0.0.1:{port}'
+            _wait_until_up(base_url, processes[0])
+
+            results = {'vendor': connection.vendor, 'stages': []}
+            for level in levels:
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'{level} concurrent users for {options["duration"]:g}s'
+                ))
+                recorder, elapsed = run_stage(
+                    base_url, accounts, items, level,
+                    options['duration'], options['think'], options['seed']
+                )
+                rows = recorder.report(elapsed)
+                self.write_table(rows, elapsed)
+                results['stages'].append({
+                    'users': level,
+                    'seconds': round(elapsed, 1),
+                    'endpoints': rows,
+                })
+            results['emails'] = smtp.messages
+            self.stdout.write(
+                f'Emails received by the SMTP sink: {smtp.messages}'
+            )
+        finally:
+            for process in processes:
+                _stop(process)
+            smtp.shutdown()
+            smtp.server_close()
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def prepare(self, options, max_users):
+        """Seeds the database; returns logged-in accounts for the virtual
+        users and a pool of items (with edit form data) to pick from."""
+        existing = InventoryItem.objects.count()
+        if existing < options['items']:
+            self.stdout.write(
+                f'Seeding {options["items"] - existing} items...'
+            )
+            generate(
+                {
+                    'items': options['items'] - existing,
+                    'notes': (options['items'] - existing) // 2,
+                    'users': max_users,
+                },
+                seed=options['seed']
+            )
+
+        accounts = [
+            {'session': session_key(user), 'email': user.email}
+            for user in User.objects.filter(
+                is_active=True
+            ).exclude(email='').order_by('id')[:max_users]
+        ]
+        if not accounts:
+            raise CommandError('There are no active users with an email.')
+
+        items = []
+        ids = list(InventoryItem.objects.values_list('id', flat=True))
+        ids = random.Random(options['seed']).sample(
+            ids, min(ITEM_POOL, len(ids))
+        )
+        for item in InventoryItem.objects.select_related(
+            'item_location'
+        ).filter(id__in=ids).order_by('id'):
+            items.append({
+                'id': item.pk,
+                'name': item.name,
+                'location': item.item_location.name,
+                'form': {
+                    'name': item.name,
+                    'stat': item.stat_id,
+                    'description': item.description,
+                    'item_location': item.item_location_id,
+                    'item_area': item.item_area_id,
+                    'mfg': item.mfg_id,
+                    'model_no': item.model_no,
+                    'serial_no': item.serial_no or '',
+                    'qty': item.qty,
+                    'total_cost': item.total_cost or '',
+                    'assigned_to': item.assigned_to_id or '',
+                    'approved_by': item.approved_by_id,
+                    'approved_date': item.approved_date,
+                    'purchase_date': item.purchase_date,
+                },
+            })
+        return accounts, items
+
+    def start_server(self, port, env, options):
+        bind = f'127.0.0.1:{port}'
+        if importlib.util.find_spec('gunicorn') is not None:
+            command = [
+                sys.executable, '-m', 'gunicorn', 'proj.wsgi:application',
+                '--bind', bind,
+                '--workers', str(options['workers']),
+                '--threads', str(options['threads']),
+                '--log-level', 'warning',
+            ]
+        else:
+            self.stderr.write(
+                'gunicorn is not installed; falling back to runserver, '
+                'which runs one process with a thread per request.'
+            )
+            command = [
+                sys.executable, 'manage.py', 'runserver', bind, '--noreload'
+            ]
+        return subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+
+    def write_table(self, rows, elapsed):
+        self.stdout.write(
+            f'{"endpoint":<28}{"reqs":>7}{"errs":>6}{"req/s":>8}'
+            f'{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"max ms":>9}'
+        )
+        for row in rows:
+            self.stdout.write(
+                f'{row["endpoint"]:<28}{row["requests"]:>7}'
+                f'{row["errors"]:>6}{row["rps"]:>8.1f}'
+                f'{row["p50_ms"]:>9.1f}{row["p95_ms"]:>9.1f}'
+                f'{row["p99_ms"]:>9.1f}{row["max_ms"]:>9.1f}'
+            )
+        total = sum(row['requests'] for row in rows)
+        self.stdout.write(
+            f'{total} requests in {elapsed:.1f}s '
+            f'({total / elapsed:.1f} req/s)'
+        )
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError('The app server exited during startup.')
+        try:
+            urllib.request.urlopen(f'{base_url}/accounts/login/', timeout=5)
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise CommandError(f'The app server did not answer within {timeout}s.')
+
+
+def _stop(process):
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
@@ -0,0 +1,175 @@
+import os
+import time
+
+from django.db import connection
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+
+
+# Request and Celery task metrics in Prometheus' text format.  Web and
+# worker processes each record their own; with PROMETHEUS_MULTIPROC_DIR set
+# (as it must be under gunicorn and Celery) they share files in that
+# directory and the metrics view adds them up.
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+SIZE_BUCKETS = tuple(2 ** n for n in range(8, 28, 2))
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+
+REQUEST_LATENCY = Histogram(
+    'django_request_duration_seconds',
+    'Time spent handling a request, by URL name.',
+    ['view', 'method'],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter(
+    'django_requests',
+    'Requests handled, by URL name and status code.',
+    ['view', 'method', 'status']
+)
+REQUEST_QUERIES = Histogram(
+    'django_request_db_queries',
+    'Database queries run per request, by URL name.',
+    ['view'],
+    buckets=QUERY_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    'django_request_db_duration_seconds',
+    'Time spent in the database per request, by URL name.',
+    ['view'],
+    buckets=LATENCY_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    'django_response_size_bytes',
+    'Response body size, by URL name.',
+    ['view'],
+    buckets=SIZE_BUCKETS
+)
+TASK_DURATION = Histogram(
+    'celery_task_duration_seconds',
+    'Time spent running a task, by task name and final state.',
+    ['task', 'state'],
+    buckets=TASK_BUCKETS
+)
+TASK_QUEUE_WAIT = Histogram(
+    'celery_task_queue_wait_seconds',
+    'Time from a task being sent to a worker starting it.',
+    ['task'],
+    buckets=TASK_BUCKETS
+)
+
+UNRESOLVED = '<unresolved>'
+
+
+class QueryTimer:
+    """``execute_wrapper`` that counts queries and their total time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def _observe_queries(view, timer):
+    REQUEST_QUERIES.labels(view).observe(timer.count)
+    REQUEST_DB_TIME.labels(view).observe(timer.seconds)
+
+
+def _counted(content, view, timer):
+    # Streamed bodies (e.g. CSV exports) are measured as they are sent, and
+    # the queries they run while being read count towards the request
+    size = 0
+    try:
+        with connection.execute_wrapper(timer):
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+    finally:
+        RESPONSE_SIZE.labels(view).observe(size)
+        _observe_queries(view, timer)
+
+
+class MetricsMiddleware:
+    """Records latency, queries and response size per URL name.
+
+    Goes first in MIDDLEWARE so the time covers the other middleware too.
+    The latency of a streamed response ends when it is returned, before
+    its body is sent; its queries and size are recorded once it has been.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else UNRESOLVED
+        REQUEST_LATENCY.labels(view, request.method).observe(duration)
+        REQUESTS.labels(view, request.method, response.status_code).inc()
+        if response.streaming:
+            response.streaming_content = _counted(
+                response.streaming_content, view, timer
+            )
+        else:
+            _observe_queries(view, timer)
+            RESPONSE_SIZE.labels(view).observe(len(response.content))
+        return response
+
+
+# Celery signal handlers (connected in core.signals)
+
+_task_starts = {}
+
+
+def stamp_published(headers=None, **kwargs):
+    # before_task_publish: the header travels with the message
+    if headers is not None:
+        headers['published_at'] = time.time()
+
+
+def task_started(task_id=None, task=None, **kwargs):
+    _task_starts[task_id] = time.perf_counter()
+    published_at = getattr(task.request, 'published_at', None)
+    if published_at is not None:
+        TASK_QUEUE_WAIT.labels(task.name).observe(
+            max(time.time() - published_at, 0)
+        )
+
+
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    start = _task_starts.pop(task_id, None)
+    if start is not None:
+        TASK_DURATION.labels(task.name, state or 'UNKNOWN').observe(
+            time.perf_counter() - start
+        )
+
+
+def render_metrics():
+    """Returns ``(body, content type)`` for the metrics endpoint."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
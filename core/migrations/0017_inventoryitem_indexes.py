@@ -0,0 +1,77 @@
+# Generated by Django 4.2.5 on 2026-10-18 06:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+
+
+def normalize_serial_numbers(apps, schema_editor):
+    # The views store serial numbers upper-cased with blanks as NULL; make
+    # older rows match before the unique constraint is added
+    InventoryItem = apps.get_model('core', 'InventoryItem')
+    InventoryItem.objects.filter(serial_no='').update(serial_no=None)
+    duplicates = InventoryItem.objects.filter(
+        serial_no__isnull=False
+    ).annotate(
+        upper_serial_no=django.db.models.functions.text.Upper('serial_no')
+    ).values('upper_serial_no').annotate(
+        count=models.Count('id')
+    ).filter(count__gt=1).order_by('upper_serial_no')
+    if duplicates:
+        lines = []
+        for row in duplicates:
+            ids = InventoryItem.objects.annotate(
+                upper_serial_no=django.db.models.functions.text.Upper(
+                    'serial_no'
+                )
+            ).filter(
+                upper_serial_no=row['upper_serial_no']
+            ).order_by('id').values_list('id', flat=True)
+            lines.append(
+                f'  {row["upper_serial_no"]}: items '
+                + ', '.join(str(pk) for pk in ids)
+            )
+        raise RuntimeError(
+            'Serial numbers must be unique ignoring case before this '
+            'migration can add that constraint.  Change or clear these '
+            'and migrate again:\n' + '\n'.join(lines)
+        )
+    InventoryItem.objects.filter(serial_no__isnull=False).update(
+        serial_no=django.db.models.functions.text.Upper('serial_no')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_exportjob_params'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['-purchase_date', 'id'], name='inv_purchase_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['stat', 'item_location', '-purchase_date', 'id'], name='inv_stat_location_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['model_no'], name='inv_model_no_idx'),
+        ),
+        # The composite index above leads with stat, so the FK's own index
+        # is redundant
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='stat',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.itemstatus'),
+        ),
+        migrations.RunPython(
+            normalize_serial_numbers, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='inventoryitem',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Upper('serial_no'), condition=models.Q(('serial_no__isnull', False)), name='inv_serial_no_upper_uniq', violation_error_message='An item with this serial number already exists.'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.5 on 2026-10-18 06:57
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+SUMMARY_DIMENSIONS = {
+    'location': 'item_location_id',
+    'area': 'item_area_id',
+    'status': 'stat_id',
+    'mfg': 'mfg_id',
+}
+
+
+def build_summaries(apps, schema_editor):
+    InventoryItem = apps.get_model('core', 'InventoryItem')
+    InventorySummary = apps.get_model('core', 'InventorySummary')
+    rows = []
+    for dimension, field in SUMMARY_DIMENSIONS.items():
+        groups = InventoryItem.objects.order_by().values(field).annotate(
+            item_count=Count('id'),
+            qty=Sum('qty'),
+            cost=Sum('total_cost'),
+        )
+        for group in groups:
+            rows.append(InventorySummary(
+                dimension=dimension,
+                key_id=group[field],
+                item_count=group['item_count'],
+                total_qty=group['qty'] or 0,
+                total_cost=Decimal(group['cost'] or 0).quantize(Decimal('0.01')),
+            ))
+    InventorySummary.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_inventoryitem_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('location', 'Location'), ('area', 'Area'), ('status', 'Status'), ('mfg', 'Manufacturer')], max_length=10)),
+                ('key_id', models.IntegerField()),
+                ('item_count', models.IntegerField(default=0)),
+                ('total_qty', models.BigIntegerField(default=0)),
+                ('total_cost', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name_plural': 'Inventory_Summaries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='inventorysummary',
+            constraint=models.UniqueConstraint(fields=('dimension', 'key_id'), name='inv_summary_dimension_key_uniq'),
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.5 on 2026-10-18 06:59
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def count_notes(apps, schema_editor):
+    InventoryItem = apps.get_model('core', 'InventoryItem')
+    ItemNotes = apps.get_model('core', 'ItemNotes')
+    counts = ItemNotes.objects.filter(
+        item=OuterRef('pk')
+    ).order_by().values('item').annotate(n=Count('id')).values('n')
+    InventoryItem.objects.update(
+        note_count=Coalesce(Subquery(counts), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_inventorysummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='note_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_notes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='itemnotes',
+            index=models.Index(fields=['item', '-inserted_date', '-id'], name='notes_item_date_idx'),
+        ),
+        # The index above leads with item, so the FK's own index is
+        # redundant
+        migrations.AlterField(
+            model_name='itemnotes',
+            name='item',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.inventoryitem'),
+        ),
+    ]
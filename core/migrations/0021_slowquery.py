@@ -0,0 +1,31 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:07
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('recorded_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('duration_ms', models.FloatField()),
+                ('fingerprint', models.CharField(db_index=True, max_length=16)),
+                ('statement', models.TextField()),
+                ('sql', models.TextField()),
+                ('params_shape', models.CharField(blank=True, max_length=255)),
+                ('view_name', models.CharField(blank=True, max_length=200)),
+                ('frame', models.CharField(blank=True, max_length=255)),
+            ],
+            options={
+                'verbose_name_plural': 'Slow_Queries',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_user_upper_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventorysummary',
+            name='key_id',
+            field=models.BigIntegerField(),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 
@@ -18,6 +19,13 @@ class User(AbstractUser):
         blank=True
     )
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Case-insensitive availability checks (see core.availability)
+            models.Index(Upper('username'), name='user_username_upper_idx'),
+            models.Index(Upper('email'), name='user_email_upper_idx'),
+        ]
+
     def __str__(self):
         return self.last_name + ', ' + self.first_name
 
@@ -106,7 +114,8 @@ class InventoryItem(models.Model):
     name = models.CharField(max_length=100, unique=True)
     stat = models.ForeignKey(
         ItemStatus,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     description = models.CharField(max_length=250)
     item_location = models.ForeignKey(
@@ -146,9 +155,36 @@ class InventoryItem(models.Model):
     inserted_date = models.DateField()
     modified_by = models.CharField(max_length=150, blank=True, null=True)
     modified_date = models.DateField(blank=True, null=True)
+    # Kept in step with ItemNotes by core.signals
+    note_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name_plural = "Inventory_Items"
+        indexes = [
+            # Default inventory table order (purchase date, newest first,
+            # with id as the paging tie-breaker)
+            models.Index(
+                fields=['-purchase_date', 'id'],
+                name='inv_purchase_date_idx'
+            ),
+            # Status + location filters in the default order, without a
+            # sort; also serves status on its own
+            models.Index(
+                fields=['stat', 'item_location', '-purchase_date', 'id'],
+                name='inv_stat_location_date_idx'
+            ),
+            models.Index(fields=['model_no'], name='inv_model_no_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                Upper('serial_no'),
+                condition=models.Q(serial_no__isnull=False),
+                name='inv_serial_no_upper_uniq',
+                violation_error_message=(
+                    'An item with this serial number already exists.'
+                )
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -157,7 +193,8 @@ class InventoryItem(models.Model):
 class ItemNotes(models.Model):
     item = models.ForeignKey(
         InventoryItem,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     comment = models.TextField()
     inserted_by = models.CharField(max_length=250)
@@ -167,6 +204,153 @@ class ItemNotes(models.Model):
 
     class Meta:
         verbose_name_plural = "Item_Notes"
+        indexes = [
+            # An item's notes, newest first (see core.views.notes); also
+            # serves the foreign key
+            models.Index(
+                fields=['item', '-inserted_date', '-id'],
+                name='notes_item_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.item.name
+
+
+class ChangeLog(models.Model):
+    """Append-only record of every InventoryItem and ItemNotes write.
+
+    Rows are only ever inserted (see core.changelog); their ids are the
+    tokens clients pass to the changes feed.
+    """
+    class Kind(models.TextChoices):
+        ITEM = ('item', 'Item')
+        NOTE = ('note', 'Note')
+
+    class Action(models.TextChoices):
+        CREATE = ('create', 'Create')
+        UPDATE = ('update', 'Update')
+        DELETE = ('delete', 'Delete')
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    object_id = models.IntegerField()
+    # The item a note belongs to (the item itself for item changes)
+    item_id = models.IntegerField()
+    action = models.CharField(max_length=10, choices=Action.choices)
+    changed_date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = "Change_Log"
+
+    def __str__(self):
+        return f'{self.action} {self.kind} {self.object_id}'
+
+
+class InventorySummary(models.Model):
+    """Running totals of InventoryItem per location, area, status and mfg.
+
+    Kept up to date as items change (see core.summaries) so the dashboard
+    never has to aggregate the whole inventory.  ``key_id`` is the id of the
+    MapLocation, Area, ItemStatus or Manufacturer the row totals.
+    """
+    class Dimension(models.TextChoices):
+        LOCATION = ('location', 'Location')
+        AREA = ('area', 'Area')
+        STATUS = ('status', 'Status')
+        MFG = ('mfg', 'Manufacturer')
+
+    dimension = models.CharField(max_length=10, choices=Dimension.choices)
+    key_id = models.BigIntegerField()
+    item_count = models.IntegerField(default=0)
+    total_qty = models.BigIntegerField(default=0)
+    total_cost = models.DecimalField(
+        max_digits=16, decimal_places=2, default=0
+    )
+
+    class Meta:
+        verbose_name_plural = "Inventory_Summaries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dimension', 'key_id'],
+                name='inv_summary_dimension_key_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.dimension} {self.key_id}'
+
+
+class ExportJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = ('PENDING', 'Pending')
+        RUNNING = ('RUNNING', 'Running')
+        DONE = ('DONE', 'Done')
+        FAILED = ('FAILED', 'Failed')
+        EXPIRED = ('EXPIRED', 'Expired')
+
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE
+    )
+    file_format = models.CharField(max_length=10, default='csv')
+    # Inventory table search/filter/sort parameters the export applies
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    total_rows = models.IntegerField(default=0)
+    rows_written = models.IntegerField(default=0)
+    file_name = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    inserted_date = models.DateTimeField(
+        default=timezone.now
+    )
+    finished_date = models.DateTimeField(blank=True, null=True)
+    expires_date = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name_plural = "Export_Jobs"
+
+    def __str__(self):
+        return f'{self.file_format} export #{self.pk}'
+
+    @property
+    def is_active(self):
+        return self.status in (self.Status.PENDING, self.Status.RUNNING)
+
+    @property
+    def progress(self):
+        if self.status == self.Status.DONE:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, self.rows_written * 100 // self.total_rows)
+
+
+class SlowQuery(models.Model):
+    """A query that took longer than SLOW_QUERY_MS (see core.slowqueries).
+
+    Only the newest SLOW_QUERY_KEEP rows are kept.  Parameter values are not
+    stored, only their types and sizes.
+    """
+    id = models.BigAutoField(primary_key=True)
+    recorded_date = models.DateTimeField(default=timezone.now)
+    duration_ms = models.FloatField()
+    # Hash of ``statement``, the SQL with literals and placeholders
+    # collapsed, so repeats of one query group together
+    fingerprint = models.CharField(max_length=16, db_index=True)
+    statement = models.TextField()
+    sql = models.TextField()
+    params_shape = models.CharField(max_length=255, blank=True)
+    view_name = models.CharField(max_length=200, blank=True)
+    # Innermost core frame on the stack, e.g. "core/views.py:312 in notes"
+    frame = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Slow_Queries"
+
+    def __str__(self):
+        return f'{self.duration_ms:.0f} ms {self.fingerprint}'
@@ -0,0 +1,196 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+
+# Per-request profiles: a sampled call-stack profile in "folded" format
+# (one "frame;frame;frame count" line per distinct stack, ready for
+# flamegraph.pl or speedscope) plus the SQL the request ran.  Staff turn it
+# on with ``?profile=1`` or an ``X-Profile: 1`` header; PROFILE_SAMPLE_RATE
+# profiles that fraction of all other requests.
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's call stack every ``interval`` seconds."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                module = frame.f_globals.get('__name__', '?')
+                stack.append(f'{module}:{code.co_name}')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class SqlRecorder:
+    """``execute_wrapper`` that records each query and how long it took."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'ms': round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+def profile_root():
+    return settings.PROFILE_ROOT
+
+
+def _wants_profile(request):
+    # request.user is lazy: only load the session and user when asked to
+    # profile, so other requests do not pay for it
+    asked = (
+        request.GET.get('profile') == '1'
+        or request.headers.get('X-Profile') == '1'
+    )
+    if asked and getattr(request, 'user', None) is not None:
+        if request.user.is_staff:
+            return True
+    rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0)
+    return rate > 0 and random.random() < rate
+
+
+def save_profile(request, response, sampler, recorder, duration):
+    """Writes ``<name>.folded`` and ``<name>.json`` under PROFILE_ROOT."""
+    root = profile_root()
+    os.makedirs(root, exist_ok=True)
+    match = request.resolver_match
+    view = match.view_name if match is not None else ''
+    now = timezone.now()
+    name = f'{now:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}'
+
+    with open(os.path.join(root, f'{name}.folded'), 'w') as f:
+        for stack, count in sampler.stacks.most_common():
+            f.write(f'{stack} {count}\n')
+
+    meta = {
+        'name': name,
+        'date': now.isoformat(),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': view,
+        'status': response.status_code,
+        'ms': round(duration * 1000, 1),
+        'samples': sum(sampler.stacks.values()),
+        'interval_ms': sampler.interval * 1000,
+        'sql_ms': round(sum(q['ms'] for q in recorder.queries), 3),
+        'queries': recorder.queries,
+    }
+    with open(os.path.join(root, f'{name}.json'), 'w') as f:
+        json.dump(meta, f)
+    _prune(root)
+
+
+def _prune(root):
+    keep = getattr(settings, 'PROFILE_KEEP', 100)
+    names = sorted(
+        file_name[:-5] for file_name in os.listdir(root)
+        if file_name.endswith('.json')
+    )
+    for name in names[:-keep]:
+        for suffix in ('.json', '.folded'):
+            try:
+                os.remove(os.path.join(root, name + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def recent_profiles():
+    """Metadata of the saved profiles, newest first, without the SQL."""
+    root = profile_root()
+    if not os.path.isdir(root):
+        return []
+    profiles = []
+    for file_name in sorted(os.listdir(root), reverse=True):
+        if not file_name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(root, file_name)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        meta['query_count'] = len(meta.pop('queries', []))
+        profiles.append(meta)
+    return profiles
+
+
+def load_profile(name):
+    """Returns a profile's metadata (with SQL), or None."""
+    if not name.replace('-', '').isalnum():
+        return None
+    try:
+        with open(os.path.join(profile_root(), f'{name}.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def folded_path(name):
+    if not name.replace('-', '').isalnum():
+        return None
+    path = os.path.join(profile_root(), f'{name}.folded')
+    return path if os.path.exists(path) else None
+
+
+class ProfilingMiddleware:
+    """Profiles requests on demand (see the module comment).
+
+    Goes after AuthenticationMiddleware, which it needs to tell staff
+    apart.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _wants_profile(request):
+            return self.get_response(request)
+
+        sampler = StackSampler(
+            threading.get_ident(),
+            getattr(settings, 'PROFILE_INTERVAL', 0.005)
+        )
+        recorder = SqlRecorder()
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            sampler.stop()
+        duration = time.perf_counter() - start
+
+        save_profile(request, response, sampler, recorder, duration)
+        return response
@@ -0,0 +1,79 @@
+import functools
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """``execute_wrapper`` that counts the queries run through it."""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+
+def _describe(label, counter, max_queries):
+    statements = '\n'.join(
+        f'{i}. {sql}' for i, sql in enumerate(counter.statements, start=1)
+    )
+    return (
+        f'{label} ran {counter.count} queries, '
+        f'over its budget of {max_queries}:\n{statements}'
+    )
+
+
+def query_budget(max_queries):
+    """Declares the most queries a view may run.
+
+    Going over budget is logged as a warning; with ``QUERY_BUDGET_RAISE``
+    turned on (as in tests) it raises ``QueryBudgetExceeded`` instead.  Put
+    it below ``login_required`` so the session and user lookups are not
+    counted against the view.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                response = view_func(request, *args, **kwargs)
+
+            if counter.count > max_queries:
+                label = f'{view_func.__name__} ({request.method})'
+                message = _describe(label, counter, max_queries)
+                if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def assert_max_queries(max_queries, using=DEFAULT_DB_ALIAS):
+    """Test helper: fails if the block runs more than ``max_queries``.
+
+        with assert_max_queries(3):
+            self.client.get(reverse('core:inventory_data'))
+    """
+    counter = QueryCounter()
+    with connections[using].execute_wrapper(counter):
+        yield counter
+
+    if counter.count > max_queries:
+        raise AssertionError(_describe('Block', counter, max_queries))
@@ -0,0 +1,60 @@
+import functools
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+
+def client_address(request):
+    """The client's address, from RATE_LIMIT_CLIENT_HEADER when set."""
+    header = getattr(settings, 'RATE_LIMIT_CLIENT_HEADER', '')
+    if header:
+        # A proxy appends the address it saw to whatever the client sent,
+        # so only the last one can be trusted
+        forwarded = request.META.get(header, '').split(',')[-1].strip()
+        if forwarded:
+            return forwarded
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def hit(scope, client, limit, window):
+    """Counts one request by ``client`` in a fixed ``window`` of seconds.
+
+    Returns 0 while the client is within ``limit``, otherwise the seconds
+    until the window resets.
+    """
+    now = int(time.time())
+    start = now - now % window
+    key = f'ratelimit:{scope}:{client}:{start}'
+    cache.add(key, 0, timeout=window + 1)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # Expired or evicted between the two calls
+        count = 1
+    if count > limit:
+        return start + window - now
+    return 0
+
+
+def rate_limit(scope, limit, window):
+    """Allows each client ``limit`` requests per ``window`` seconds across
+    the views sharing ``scope``; past that they get a 429.  Turned off by
+    RATE_LIMIT_ENABLED = False (as in benchmark_views)."""
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+                return view_func(request, *args, **kwargs)
+            retry_after = hit(scope, client_address(request), limit, window)
+            if retry_after:
+                response = HttpResponse(
+                    'Too many requests; try again shortly.', status=429
+                )
+                response['Retry-After'] = str(retry_after)
+                return response
+            return view_func(request, *args, **kwargs)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,65 @@
+import time
+
+from django.core.cache import cache
+
+from .datatables import ROW_VALUES, format_row
+from .lookups import lookups_version
+from .models import InventoryItem
+
+
+# Formatted inventory table rows (see datatables.format_row) are cached per
+# item.  Each item has a version key that any write deletes (see
+# core.changelog); row keys include that version and the lookups version,
+# so editing an item or renaming a lookup row or user it shows retires its
+# entry (see core.signals).
+# A row read before a write commits is stored under the old version and is
+# never served afterwards.  Version keys expire with the rows: a version
+# minted after one expires matches no row still cached.
+ROW_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(pk):
+    return f'invrow:v:{pk}'
+
+
+def invalidate_rows(item_ids):
+    cache.delete_many([_version_key(pk) for pk in item_ids])
+
+
+def _row_versions(item_ids):
+    keys = {pk: _version_key(pk) for pk in item_ids}
+    found = cache.get_many(keys.values())
+    versions = {}
+    new = {}
+    for pk, key in keys.items():
+        if key in found:
+            versions[pk] = found[key]
+        else:
+            versions[pk] = new[key] = int(time.time() * 1000)
+    if new:
+        cache.set_many(new, timeout=ROW_CACHE_TIMEOUT)
+    return versions
+
+
+def cached_rows(item_ids):
+    """Returns the formatted table rows for ``item_ids``, in that order.
+
+    Rows missing from the cache are fetched with a single query and
+    stored for next time.
+    """
+    versions = _row_versions(item_ids)
+    prefix = f'invrow:{lookups_version()}'
+    keys = {pk: f'{prefix}:{pk}:{versions[pk]}' for pk in item_ids}
+    rows = cache.get_many(keys.values())
+
+    missing = [pk for pk in item_ids if keys[pk] not in rows]
+    if missing:
+        fresh = {}
+        for values in InventoryItem.objects.filter(
+            id__in=missing
+        ).values(*ROW_VALUES):
+            fresh[keys[values['id']]] = format_row(values)
+        cache.set_many(fresh, timeout=ROW_CACHE_TIMEOUT)
+        rows.update(fresh)
+
+    return [rows[keys[pk]] for pk in item_ids if keys[pk] in rows]
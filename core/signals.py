@@ -1,8 +1,189 @@
+import functools
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
 from django.dispatch import receiver
+from celery.signals import before_task_publish, task_postrun, task_prerun
 from django.contrib.auth.signals import user_logged_out
 from django.contrib import messages
 
+from .lookups import LOOKUP_MODELS, bump_lookups_version
+from .changelog import log_change
+from . import availability, slowqueries
+from .metrics import stamp_published, task_finished, task_started
+from .models import ChangeLog, InventoryItem, ItemNotes, User
+from .summaries import SUMMARY_FIELDS, record_change, summary_values
+
 
 @receiver(user_logged_out)
 def log_user_logout(sender, request, user, **kwargs):
     messages.success(request, "You have successfully logged out!")
+
+
+def invalidate_lookups(sender, **kwargs):
+    # Wait for the write to be visible before other processes reload
+    transaction.on_commit(bump_lookups_version)
+
+
+for model in LOOKUP_MODELS.values():
+    post_save.connect(
+        invalidate_lookups,
+        sender=model,
+        dispatch_uid=f'invalidate_lookups_save_{model.__name__}'
+    )
+    post_delete.connect(
+        invalidate_lookups,
+        sender=model,
+        dispatch_uid=f'invalidate_lookups_delete_{model.__name__}'
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_names(sender, instance, created, raw=False,
+                          update_fields=None, **kwargs):
+    # Table rows and exports show who inserted each item, and are cached
+    # and validated on the lookups version like the other names they show
+    if created or raw:
+        return
+    if update_fields is not None and not {
+        'first_name', 'last_name'
+    } & set(update_fields):
+        return
+    transaction.on_commit(bump_lookups_version)
+
+
+def _saves_names(update_fields):
+    # Saves that cannot change the names (e.g. last_login at each login)
+    # leave every process's filters alone
+    return update_fields is None or bool(
+        set(availability.FIELDS) & set(update_fields)
+    )
+
+
+@receiver(pre_save, sender=User)
+def remember_old_names(sender, instance, raw=False, update_fields=None,
+                       **kwargs):
+    # The names being replaced, whose cached "taken" answers must go
+    instance._availability_old = None
+    if instance.pk is not None and not raw and _saves_names(update_fields):
+        instance._availability_old = User.objects.filter(
+            pk=instance.pk
+        ).values(*availability.FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def remember_taken_names(sender, instance, created, raw=False,
+                         update_fields=None, **kwargs):
+    if raw or not (created or _saves_names(update_fields)):
+        return
+    values = {field: getattr(instance, field) for field in availability.FIELDS}
+    old_values = getattr(instance, '_availability_old', None)
+    # Other processes must see the row once they see the new version
+    transaction.on_commit(
+        functools.partial(availability.user_saved, values, old_values)
+    )
+
+
+@receiver(post_delete, sender=User)
+def forget_taken_names(sender, instance, **kwargs):
+    values = {field: getattr(instance, field) for field in availability.FIELDS}
+    # Until the delete commits the lookup would still find the user
+    transaction.on_commit(
+        functools.partial(availability.user_deleted, values)
+    )
+
+
+@receiver(pre_save, sender=InventoryItem)
+@receiver(pre_delete, sender=InventoryItem)
+def remember_summary_values(sender, instance, raw=False, **kwargs):
+    # The stored totals to move away from, which the instance in hand may
+    # not match
+    instance._summary_old = None
+    if instance.pk is not None and not raw:
+        old = InventoryItem.objects.filter(pk=instance.pk)
+        if transaction.get_connection().in_atomic_block:
+            # Locked until the write commits, so a concurrent save of the
+            # same item reads the values this one leaves.  A save outside a
+            # transaction cannot hold the lock; rebuild_inventory_summary
+            # repairs what such a race leaves behind.
+            old = old.select_for_update()
+        instance._summary_old = old.values(*SUMMARY_FIELDS).first()
+
+
+@receiver(post_save, sender=InventoryItem)
+def update_summaries_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    record_change(
+        getattr(instance, '_summary_old', None), summary_values(instance)
+    )
+
+
+@receiver(post_delete, sender=InventoryItem)
+def update_summaries_on_delete(sender, instance, **kwargs):
+    record_change(getattr(instance, '_summary_old', None), None)
+
+
+@receiver(post_save, sender=ItemNotes)
+def count_note(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        InventoryItem.objects.filter(pk=instance.item_id).update(
+            note_count=F('note_count') + 1
+        )
+
+
+@receiver(post_delete, sender=ItemNotes)
+def uncount_note(sender, instance, **kwargs):
+    InventoryItem.objects.filter(
+        pk=instance.item_id, note_count__gt=0
+    ).update(note_count=F('note_count') - 1)
+
+
+@receiver(post_save, sender=InventoryItem)
+def log_item_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    action = ChangeLog.Action.CREATE if created else ChangeLog.Action.UPDATE
+    log_change(ChangeLog.Kind.ITEM, instance.pk, instance.pk, action)
+
+
+@receiver(post_delete, sender=InventoryItem)
+def log_item_delete(sender, instance, **kwargs):
+    log_change(
+        ChangeLog.Kind.ITEM, instance.pk, instance.pk, ChangeLog.Action.DELETE
+    )
+
+
+@receiver(post_save, sender=ItemNotes)
+def log_note_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    action = ChangeLog.Action.CREATE if created else ChangeLog.Action.UPDATE
+    log_change(ChangeLog.Kind.NOTE, instance.pk, instance.item_id, action)
+
+
+@receiver(post_delete, sender=ItemNotes)
+def log_note_delete(sender, instance, **kwargs):
+    log_change(
+        ChangeLog.Kind.NOTE,
+        instance.pk,
+        instance.item_id,
+        ChangeLog.Action.DELETE
+    )
+
+
+# Celery task metrics (core.metrics)
+before_task_publish.connect(stamp_published, dispatch_uid='metrics_publish')
+task_prerun.connect(task_started, dispatch_uid='metrics_task_started')
+task_postrun.connect(task_finished, dispatch_uid='metrics_task_finished')
+
+# Slow queries run by Celery tasks (core.slowqueries)
+task_prerun.connect(
+    slowqueries.task_started, dispatch_uid='slow_queries_task_started'
+)
+task_postrun.connect(
+    slowqueries.task_finished, dispatch_uid='slow_queries_task_finished'
+)
@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Count, Max, Sum
+
+from .models import SlowQuery
+
+
+logger = logging.getLogger(__name__)
+
+# Queries over SLOW_QUERY_MS are saved as SlowQuery rows once the response is
+# ready (or the Celery task has finished), along with the innermost frame of
+# our own code that ran them.  The wrappers in WRAPPER_FILES sit on the
+# stack of every query, so they are never reported as its source.
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(CORE_DIR)
+WRAPPER_FILES = {
+    os.path.join(CORE_DIR, f'{module}.py')
+    for module in ('slowqueries', 'metrics', 'querybudget', 'profiling')
+}
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'%s|\?')
+_LISTS = re.compile(r'\?(?:\s*,\s*\?)+')
+_SPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """SQL with literals and placeholders replaced, for grouping.
+
+    Queries differing only in their values, or in how many values an IN
+    list holds, normalize the same.
+    """
+    statement = _STRINGS.sub('?', sql)
+    statement = _NUMBERS.sub('?', statement)
+    statement = _PLACEHOLDERS.sub('?', statement)
+    statement = _LISTS.sub('?...', statement)
+    return _SPACE.sub(' ', statement).strip()
+
+
+def fingerprint(statement):
+    return hashlib.sha1(statement.encode()).hexdigest()[:16]
+
+
+def params_shape(params, many):
+    """Types (and sizes) of a query's parameters, never their values."""
+    if params is None:
+        return ''
+    if many:
+        params = list(params)
+        first = params_shape(params[0], False) if params else ''
+        return f'{len(params)} x {first}'
+    if isinstance(params, dict):
+        params = params.values()
+    shape = []
+    for value in params:
+        kind = type(value).__name__
+        if isinstance(value, (str, bytes, list, tuple)):
+            kind = f'{kind}({len(value)})'
+        shape.append(kind)
+    return f'[{", ".join(shape)}]'[:255]
+
+
+def calling_frame():
+    """``core/module.py:line in function`` for the innermost core frame."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        file_name = frame.f_code.co_filename
+        if file_name.startswith(CORE_DIR) and file_name not in WRAPPER_FILES:
+            path = os.path.relpath(file_name, PROJECT_DIR)
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'[:255]
+        frame = frame.f_back
+    return ''
+
+
+class SlowQueryRecorder:
+    """``execute_wrapper`` that keeps the queries over ``threshold_ms``."""
+
+    def __init__(self, threshold_ms):
+        self.threshold_ms = threshold_ms
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if duration_ms >= self.threshold_ms:
+                statement = normalize(sql)
+                self.slow.append(SlowQuery(
+                    duration_ms=round(duration_ms, 3),
+                    fingerprint=fingerprint(statement),
+                    statement=statement,
+                    sql=sql,
+                    params_shape=params_shape(params, many),
+                    frame=calling_frame()
+                ))
+
+
+def save_slow_queries(queries, view_name=''):
+    keep = getattr(settings, 'SLOW_QUERY_KEEP', 1000)
+    for query in queries:
+        query.view_name = view_name[:200]
+    try:
+        SlowQuery.objects.bulk_create(queries)
+        newest = SlowQuery.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first()
+        SlowQuery.objects.filter(id__lte=newest - keep).delete()
+    except DatabaseError:
+        # Never fail the request over its diagnostics
+        logger.exception('Could not save slow queries')
+
+
+def slow_query_summary():
+    """Recorded slow queries grouped by fingerprint, worst total first."""
+    groups = list(
+        SlowQuery.objects.values('fingerprint').annotate(
+            count=Count('id'),
+            total_ms=Sum('duration_ms'),
+            max_ms=Max('duration_ms'),
+            last_seen=Max('recorded_date')
+        ).order_by('-total_ms')
+    )
+    # One statement and the places that ran it, per fingerprint
+    statements = dict(
+        SlowQuery.objects.filter(
+            id__in=SlowQuery.objects.values('fingerprint').annotate(
+                latest=Max('id')
+            ).values('latest')
+        ).values_list('fingerprint', 'statement')
+    )
+    sources = {}
+    for row in SlowQuery.objects.values(
+        'fingerprint', 'view_name', 'frame'
+    ).annotate(count=Count('id')).order_by('-count'):
+        sources.setdefault(row['fingerprint'], []).append(row)
+    for group in groups:
+        group['avg_ms'] = group['total_ms'] / group['count']
+        group['statement'] = statements.get(group['fingerprint'], '')
+        group['sources'] = sources.get(group['fingerprint'], [])
+    return groups
+
+
+class SlowQueryMiddleware:
+    """Records the slow queries a request runs (see the module comment)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold_ms = getattr(settings, 'SLOW_QUERY_MS', 0)
+        if not threshold_ms:
+            return self.get_response(request)
+
+        recorder = SlowQueryRecorder(threshold_ms)
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        if recorder.slow:
+            match = request.resolver_match
+            view_name = match.view_name if match is not None else ''
+            save_slow_queries(recorder.slow, view_name)
+        return response
+
+
+# Celery signal handlers (connected in core.signals).  Tasks are recorded
+# under "task:<name>" in place of a URL name.  The wrapper is entered when
+# a task starts and exited when it finishes, which happen on the same
+# thread.
+
+_task_recorders = {}
+
+
+def task_started(task_id=None, **kwargs):
+    threshold_ms = getattr(settings, 'SLOW_QUERY_MS', 0)
+    if threshold_ms:
+        recorder = SlowQueryRecorder(threshold_ms)
+        stack = ExitStack()
+        stack.enter_context(connection.execute_wrapper(recorder))
+        _task_recorders[task_id] = (recorder, stack)
+
+
+def task_finished(task_id=None, task=None, **kwargs):
+    recorder, stack = _task_recorders.pop(task_id, (None, None))
+    if recorder is None:
+        return
+    stack.close()
+    if recorder.slow:
+        save_slow_queries(recorder.slow, f'task:{task.name}')
@@ -0,0 +1,252 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+
+from .lookups import get_lookups
+from .models import InventoryItem, InventorySummary
+
+
+# InventoryItem foreign key behind each summary dimension
+SUMMARY_DIMENSIONS = {
+    InventorySummary.Dimension.LOCATION: 'item_location_id',
+    InventorySummary.Dimension.AREA: 'item_area_id',
+    InventorySummary.Dimension.STATUS: 'stat_id',
+    InventorySummary.Dimension.MFG: 'mfg_id',
+}
+
+SUMMARY_FIELDS = tuple(SUMMARY_DIMENSIONS.values()) + ('qty', 'total_cost')
+
+CENT = Decimal('0.01')
+
+# Lookup table (see core.lookups) naming each dimension's keys
+SUMMARY_LOOKUPS = {
+    InventorySummary.Dimension.LOCATION: 'item_location',
+    InventorySummary.Dimension.AREA: 'item_area',
+    InventorySummary.Dimension.STATUS: 'stat',
+    InventorySummary.Dimension.MFG: 'mfg',
+}
+
+
+def _cents(value):
+    # SQLite sums decimals as floats
+    return Decimal(value or 0).quantize(CENT)
+
+
+def _totals(values, sign=1):
+    """``(count, qty, cost)`` contributed by one item's values."""
+    return (
+        sign,
+        sign * (values['qty'] or 0),
+        sign * (values['total_cost'] or Decimal(0)),
+    )
+
+
+def _add(deltas, values, totals):
+    for dimension, field in SUMMARY_DIMENSIONS.items():
+        key = (dimension, values[field])
+        deltas[key] = tuple(a + b for a, b in zip(deltas[key], totals))
+
+
+def _new_deltas():
+    return defaultdict(lambda: (0, 0, Decimal(0)))
+
+
+def _changes(by_delta):
+    """One ``column + CASE ... END`` per total, covering every key."""
+    changes = {}
+    for index, column in enumerate(('item_count', 'total_qty', 'total_cost')):
+        output_field = InventorySummary._meta.get_field(column)
+        whens = [
+            When(_match(keys), then=Value(delta[index]))
+            for delta, keys in by_delta.items()
+        ]
+        changes[column] = F(column) + Case(
+            *whens, default=Value(0), output_field=output_field
+        )
+    return changes
+
+
+def _match(keys):
+    match = Q()
+    for dimension, key_id in keys:
+        match |= Q(dimension=dimension, key_id=key_id)
+    return match
+
+
+def apply_deltas(deltas):
+    """Adds ``{(dimension, key_id): (count, qty, cost)}`` to the summaries.
+
+    Rows are created the first time a key is seen, then every key is
+    updated by one UPDATE whose CASE groups the keys sharing a delta, so it
+    takes two or three queries however many keys and deltas there are.
+    """
+    by_delta = defaultdict(list)
+    for key, delta in deltas.items():
+        if any(delta):
+            by_delta[delta].append(key)
+    if not by_delta:
+        return
+
+    keys = [key for keys in by_delta.values() for key in keys]
+    match = _match(keys)
+    existing = set(
+        InventorySummary.objects.filter(match).values_list(
+            'dimension', 'key_id'
+        )
+    )
+    missing = [key for key in keys if key not in existing]
+    if missing:
+        # Another process may be creating the same rows
+        InventorySummary.objects.bulk_create(
+            [
+                InventorySummary(dimension=dimension, key_id=key_id)
+                for dimension, key_id in missing
+            ],
+            ignore_conflicts=True
+        )
+    InventorySummary.objects.filter(match).update(**_changes(by_delta))
+
+
+def summary_values(item):
+    """The values of ``item`` the summaries are built from."""
+    return {field: getattr(item, field) for field in SUMMARY_FIELDS}
+
+
+def record_change(old, new):
+    """Moves one item's totals from its ``old`` values to its ``new`` ones.
+
+    Either side may be None, for an item being created or deleted.
+    """
+    deltas = _new_deltas()
+    if old is not None:
+        _add(deltas, old, _totals(old, -1))
+    if new is not None:
+        _add(deltas, new, _totals(new))
+    apply_deltas(deltas)
+
+
+def record_created(items):
+    """Adds items inserted without signals (e.g. by bulk_create)."""
+    deltas = _new_deltas()
+    for item in items:
+        values = summary_values(item)
+        _add(deltas, values, _totals(values))
+    apply_deltas(deltas)
+
+
+def record_bulk_update(queryset, changes):
+    """Applies ``queryset.update(**changes)`` to the summaries.
+
+    Call it before the update, in the same transaction.  The selected
+    items are grouped by their current dimensions in one query and the
+    summaries updated in one more (see apply_deltas), however many items
+    and groups there are.
+    """
+    changes = {
+        field if field.endswith('_id') else f'{field}_id':
+            getattr(value, 'pk', value)
+        for field, value in changes.items()
+    }
+    if not any(field in SUMMARY_FIELDS for field in changes):
+        return
+
+    groups = queryset.order_by().values(
+        *SUMMARY_DIMENSIONS.values()
+    ).annotate(
+        item_count=Count('id'),
+        qty=Sum('qty'),
+        total_cost=Sum('total_cost'),
+    )
+    deltas = _new_deltas()
+    for group in groups:
+        totals = (
+            group['item_count'],
+            group['qty'] or 0,
+            _cents(group['total_cost']),
+        )
+        _add(deltas, group, tuple(-value for value in totals))
+        _add(deltas, {**group, **changes}, totals)
+    apply_deltas(deltas)
+
+
+def dashboard_summaries():
+    """Returns ``{dimension: [row, ...]}`` for the dashboard, by name.
+
+    One query over the summary table; names come from the lookup cache.
+    """
+    lookups = get_lookups()
+    names = {
+        dimension: {row['id']: row for row in lookups[lookup]}
+        for dimension, lookup in SUMMARY_LOOKUPS.items()
+    }
+    locations = names[InventorySummary.Dimension.LOCATION]
+
+    tables = {dimension: [] for dimension in SUMMARY_DIMENSIONS}
+    for row in InventorySummary.objects.filter(item_count__gt=0):
+        lookup_row = names[row.dimension].get(row.key_id)
+        if lookup_row is None:
+            continue
+        name = lookup_row['name']
+        if row.dimension == InventorySummary.Dimension.AREA:
+            location = locations.get(lookup_row['map_loc_id'])
+            if location is not None:
+                name = f'{location["name"]} / {name}'
+        tables[row.dimension].append({
+            'name': name,
+            'item_count': row.item_count,
+            'total_qty': row.total_qty,
+            'total_cost': row.total_cost,
+        })
+    for rows in tables.values():
+        rows.sort(key=lambda row: row['name'].lower())
+    return tables
+
+
+def build_summaries():
+    """Returns freshly aggregated (unsaved) summary rows for every item."""
+    rows = []
+    for dimension, field in SUMMARY_DIMENSIONS.items():
+        groups = InventoryItem.objects.order_by().values(field).annotate(
+            item_count=Count('id'),
+            qty=Sum('qty'),
+            cost=Sum('total_cost'),
+        )
+        for group in groups:
+            rows.append(InventorySummary(
+                dimension=dimension,
+                key_id=group[field],
+                item_count=group['item_count'],
+                total_qty=group['qty'] or 0,
+                total_cost=_cents(group['cost']),
+            ))
+    return rows
+
+
+def rebuild_summaries():
+    """Replaces the summaries with totals recomputed from scratch.
+
+    Returns the rows that were added, changed or removed.
+    """
+    with transaction.atomic():
+        current = {
+            (row.dimension, row.key_id): row
+            for row in InventorySummary.objects.select_for_update()
+            if row.item_count
+        }
+        rows = build_summaries()
+        drift = []
+        for row in rows:
+            old = current.pop((row.dimension, row.key_id), None)
+            if old is None or (
+                old.item_count,
+                old.total_qty,
+                old.total_cost
+            ) != (row.item_count, row.total_qty, row.total_cost):
+                drift.append(row)
+        drift.extend(current.values())
+
+        InventorySummary.objects.all().delete()
+        InventorySummary.objects.bulk_create(rows)
+    return drift
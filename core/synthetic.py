@@ -0,0 +1,346 @@
+import datetime
+import decimal
+import itertools
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+
+from .availability import bump_users_version
+from .changelog import INVENTORY_VERSION
+from .lookups import bump_lookups_version
+from .models import (
+    ApprovalList,
+    Area,
+    Assignee,
+    InventoryItem,
+    ItemNotes,
+    ItemStatus,
+    Manufacturer,
+    MapLocation,
+    User
+)
+from .summaries import rebuild_summaries
+
+
+# Synthetic data for local load and performance work.  Everything comes
+# from one seeded random.Random, so the same counts, seed and batch size
+# give the same rows on PostgreSQL and SQLite alike.  Popularity is skewed
+# the way real inventories are: a few buildings, manufacturers, assignees
+# and items account for most of the rows that point at them.
+#
+# Usernames, item names and serial numbers are numbered on from the
+# highest id in the table.  A generated row's number is never above its
+# own id, so the new numbers are free even after rows have been deleted.
+#
+# Rows are written with bulk_create, which skips the signals that keep the
+# summaries, note counts and caches current; generate() fills those in
+# itself.  The change log is not, so changes-feed clients should take a
+# fresh copy afterwards.
+
+BATCH_SIZE = 5000
+
+DEFAULT_COUNTS = {
+    'locations': 25,
+    'areas': 200,
+    'manufacturers': 60,
+    'assignees': 500,
+    'approvers': 25,
+    'users': 50,
+    'items': 10000,
+    'notes': 5000,
+}
+
+# Weights, not percentages
+STATUSES = {
+    'Active': 75,
+    'Spare': 10,
+    'In Repair': 5,
+    'Retired': 10,
+}
+QUANTITIES = {1: 70, 2: 12, 3: 6, 5: 5, 10: 4, 25: 3}
+
+KINDS = (
+    'Laptop', 'Desktop', 'Monitor', 'Projector', 'Printer', 'Router',
+    'Switch', 'Access Point', 'Tablet', 'Phone', 'Camera', 'Server',
+    'Microscope', 'Oscilloscope', 'Centrifuge', 'Chair', 'Desk', 'Cabinet',
+)
+ADJECTIVES = (
+    'Standard', 'Compact', 'Portable', 'Heavy-duty', 'Refurbished', 'Loaner',
+    'Lab', 'Classroom', 'Office', 'Field',
+)
+FIRST_NAMES = (
+    'Alex', 'Blair', 'Casey', 'Dana', 'Emery', 'Finley', 'Gray', 'Harper',
+    'Jordan', 'Kai', 'Logan', 'Morgan', 'Noel', 'Parker', 'Quinn', 'Riley',
+    'Sage', 'Taylor', 'Val', 'Wren',
+)
+LAST_NAMES = (
+    'Adams', 'Brooks', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Hughes',
+    'Ito', 'Jones', 'Khan', 'Lopez', 'Murphy', 'Nguyen', 'Okafor', 'Patel',
+    'Rossi', 'Smith', 'Tanaka', 'Walker',
+)
+NOTE_TEXTS = (
+    'Checked during annual audit.',
+    'Moved to a new room.',
+    'Sent out for repair.',
+    'Returned from repair.',
+    'Reassigned.',
+    'Battery replaced.',
+    'Missing power cable.',
+    'Label reprinted.',
+    'Scheduled for replacement next year.',
+    'Cosmetic damage noted.',
+)
+
+MAX_COST = decimal.Decimal('999999.99')
+CENT = decimal.Decimal('0.01')
+
+
+def _zipf(count, exponent=1.1):
+    """Cumulative weights for picking from ``count`` rows, most popular
+    first."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def _person(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def _bulk(model, rows, batch_size):
+    created = []
+    for start in range(0, len(rows), batch_size):
+        created.extend(
+            model.objects.bulk_create(rows[start:start + batch_size])
+        )
+    return created
+
+
+def _next_number(model):
+    return (model.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+
+
+def _split(total, parts, index):
+    # The index-th of ``parts`` near-equal shares of ``total``; the shares
+    # always add up to exactly ``total``
+    return total * (index + 1) // parts - total * index // parts
+
+
+def generate_lookups(counts, rng, batch_size=BATCH_SIZE):
+    """Creates the lookup rows and users items point at."""
+    locations = _bulk(MapLocation, [
+        MapLocation(name=f'Building {i + 1:03d}')
+        for i in range(counts['locations'])
+    ], batch_size)
+
+    # Bigger buildings get more rooms, and every building gets at least one
+    area_weights = _zipf(len(locations), 0.8)
+    per_location = [1] * len(locations)
+    for _ in range(max(counts['areas'] - len(locations), 0)):
+        per_location[rng.choices(
+            range(len(locations)), cum_weights=area_weights
+        )[0]] += 1
+    areas = _bulk(Area, [
+        Area(name=f'Room {100 + i}', map_loc=location)
+        for location, count in zip(locations, per_location)
+        for i in range(count)
+    ], batch_size)
+
+    manufacturers = _bulk(Manufacturer, [
+        Manufacturer(name=f'Manufacturer {i + 1:03d}')
+        for i in range(counts['manufacturers'])
+    ], batch_size)
+    assignees = _bulk(Assignee, [
+        Assignee(name=' '.join(_person(rng)))
+        for _ in range(counts['assignees'])
+    ], batch_size)
+    approvers = _bulk(ApprovalList, [
+        ApprovalList(name=' '.join(_person(rng)))
+        for _ in range(counts['approvers'])
+    ], batch_size)
+    statuses = list(ItemStatus.objects.filter(name__in=STATUSES))
+    missing = set(STATUSES) - {status.name for status in statuses}
+    statuses += _bulk(ItemStatus, [
+        ItemStatus(name=name) for name in STATUSES if name in missing
+    ], batch_size)
+
+    # Hashing is deliberately slow, so every user shares one password
+    password = make_password('password', salt=f'synthetic{rng.random()}')
+    first = _next_number(User)
+    users = []
+    for i in range(counts['users']):
+        first_name, last_name = _person(rng)
+        users.append(User(
+            username=f'user{first + i:05d}',
+            first_name=first_name,
+            last_name=last_name,
+            email=f'user{first + i:05d}@example.com',
+            password=password
+        ))
+    users = _bulk(User, users, batch_size)
+
+    return {
+        'locations': locations,
+        'areas': areas,
+        'manufacturers': manufacturers,
+        'assignees': assignees,
+        'approvers': approvers,
+        'statuses': statuses,
+        'users': users,
+    }
+
+
+def generate_items(count, notes, lookups, rng, until,
+                   batch_size=BATCH_SIZE, progress=None):
+    """Creates ``count`` items carrying ``notes`` notes between them.
+
+    ``progress`` is called with the number of items written so far after
+    each batch.
+    """
+    locations = lookups['locations']
+    location_weights = _zipf(len(locations), 0.8)
+    areas_by_location = {}
+    for area in lookups['areas']:
+        areas_by_location.setdefault(area.map_loc_id, []).append(area)
+    area_weights = {
+        location_id: _zipf(len(areas))
+        for location_id, areas in areas_by_location.items()
+    }
+    mfgs = lookups['manufacturers']
+    mfg_weights = _zipf(len(mfgs))
+    assignees = lookups['assignees']
+    assignee_weights = _zipf(len(assignees)) if assignees else None
+    approvers = lookups['approvers']
+    users = lookups['users']
+    user_weights = _zipf(len(users))
+    statuses = {status.name: status for status in lookups['statuses']}
+    status_names = list(STATUSES)
+    status_weights = list(STATUSES.values())
+    quantities = list(QUANTITIES)
+    quantity_weights = list(QUANTITIES.values())
+    # Each manufacturer makes a handful of models
+    models_by_mfg = {
+        mfg.pk: [
+            f'{mfg.name[-3:]}-{rng.randrange(10000):04d}'
+            for _ in range(rng.randint(3, 30))
+        ]
+        for mfg in mfgs
+    }
+
+    first = _next_number(InventoryItem)
+    batches = max((count + batch_size - 1) // batch_size, 1)
+    written = 0
+    for batch_index in range(batches):
+        size = _split(count, batches, batch_index)
+        # A few items collect most of the notes
+        note_counts = [0] * size
+        if size:
+            weights = list(itertools.accumulate(
+                rng.paretovariate(2) for _ in range(size)
+            ))
+            for _ in range(_split(notes, batches, batch_index)):
+                note_counts[
+                    rng.choices(range(size), cum_weights=weights)[0]
+                ] += 1
+
+        items = []
+        for i in range(size):
+            number = first + written + i
+            location = rng.choices(locations, cum_weights=location_weights)[0]
+            area = rng.choices(
+                areas_by_location[location.pk],
+                cum_weights=area_weights[location.pk]
+            )[0]
+            mfg = rng.choices(mfgs, cum_weights=mfg_weights)[0]
+            kind = rng.choice(KINDS)
+            purchased = until - datetime.timedelta(
+                days=int(rng.triangular(0, 3650, 0))
+            )
+            inserted = purchased + datetime.timedelta(days=rng.randrange(30))
+            cost = decimal.Decimal(rng.lognormvariate(6.5, 1.2))
+            item = InventoryItem(
+                name=f'{kind} {number:07d}',
+                stat=statuses[rng.choices(
+                    status_names, weights=status_weights
+                )[0]],
+                description=f'{rng.choice(ADJECTIVES)} {kind.lower()}',
+                item_location_id=area.map_loc_id,
+                item_area=area,
+                mfg=mfg,
+                model_no=rng.choice(models_by_mfg[mfg.pk]),
+                serial_no=(
+                    f'SN{number:09d}' if rng.random() < 0.95 else None
+                ),
+                qty=rng.choices(quantities, weights=quantity_weights)[0],
+                total_cost=min(cost, MAX_COST).quantize(CENT),
+                assigned_to=(
+                    rng.choices(assignees, cum_weights=assignee_weights)[0]
+                    if assignees and rng.random() < 0.7 else None
+                ),
+                approved_by=rng.choice(approvers),
+                approved_date=purchased - datetime.timedelta(
+                    days=rng.randrange(45)
+                ),
+                purchase_date=purchased,
+                inserted_by=rng.choices(users, cum_weights=user_weights)[0],
+                inserted_date=min(inserted, until),
+                note_count=note_counts[i]
+            )
+            if rng.random() < 0.3:
+                item.modified_by = str(rng.choice(users))
+                item.modified_date = min(
+                    inserted + datetime.timedelta(days=rng.randrange(900)),
+                    until
+                )
+            items.append(item)
+
+        with transaction.atomic():
+            items = InventoryItem.objects.bulk_create(items)
+            item_notes = []
+            for item in items:
+                noted = datetime.datetime.combine(
+                    item.inserted_date,
+                    datetime.time(9),
+                    tzinfo=datetime.timezone.utc
+                )
+                for _ in range(item.note_count):
+                    noted += datetime.timedelta(
+                        hours=rng.randrange(1, 24 * 90)
+                    )
+                    item_notes.append(ItemNotes(
+                        item=item,
+                        comment=rng.choice(NOTE_TEXTS),
+                        inserted_by=str(rng.choice(users)),
+                        inserted_date=noted
+                    ))
+            ItemNotes.objects.bulk_create(item_notes, batch_size=batch_size)
+
+        written += size
+        if progress is not None:
+            progress(written)
+    return written
+
+
+def generate(counts, seed=1, until=datetime.date(2025, 12, 31),
+             batch_size=BATCH_SIZE, progress=None):
+    """Adds synthetic rows in the amounts given by ``counts`` (see
+    DEFAULT_COUNTS) and brings the summaries and caches up to date."""
+    counts = {**DEFAULT_COUNTS, **counts}
+    for name in ('locations', 'areas', 'manufacturers', 'approvers', 'users'):
+        if counts['items'] and counts[name] < 1:
+            raise ValueError(f'Items need at least one of: {name}.')
+
+    rng = random.Random(seed)
+    lookups = generate_lookups(counts, rng, batch_size)
+    generate_items(
+        counts['items'], counts['notes'], lookups, rng, until,
+        batch_size=batch_size, progress=progress
+    )
+
+    rebuild_summaries()
+    bump_lookups_version()
+    bump_users_version()
+    INVENTORY_VERSION.bump()
+    return lookups
@@ -1,7 +1,26 @@
 import os
+import datetime
+import logging
 
 from celery import shared_task
+from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
+from django.utils import timezone
+
+from .exports import (
+    EXPORT_FORMATS,
+    export_path,
+    export_rows,
+    write_export
+)
+from .datatables import filtered_inventory
+from .models import ExportJob
+
+
+logger = logging.getLogger(__name__)
+
+# How often (in rows) a running export saves its progress
+PROGRESS_EVERY = 1000
 
 
 @shared_task()
@@ -35,3 +54,68 @@ def send_registration_email_task(first_name, last_name, username, email):
     )
     msg.attach_alternative(html_content, "text/html")
     msg.send()
+
+
+def _track_progress(job, rows):
+    """Passes ``rows`` through, saving the count on ``job`` as it goes."""
+    written = 0
+    for row in rows:
+        yield row
+        written += 1
+        if written % PROGRESS_EVERY == 0:
+            ExportJob.objects.filter(pk=job.pk).update(rows_written=written)
+    job.rows_written = written
+
+
+@shared_task()
+def run_export_job(job_id):
+    """Writes an inventory export file to EXPORT_ROOT for an ExportJob."""
+    job = ExportJob.objects.get(pk=job_id)
+    file_name = f'inventory-{job.pk}.{job.file_format}'
+    partial_path = export_path(file_name + '.part')
+
+    try:
+        job.status = ExportJob.Status.RUNNING
+        queryset = filtered_inventory(job.params)
+        job.total_rows = queryset.count()
+        job.save(update_fields=['status', 'total_rows'])
+
+        os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+        fields = EXPORT_FORMATS[job.file_format].fields
+        rows = _track_progress(job, export_rows(queryset, fields=fields))
+        write_export(job.file_format, partial_path, rows=rows)
+        os.replace(partial_path, export_path(file_name))
+    except Exception as e:
+        logger.exception('Export job %s failed', job.pk)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        job.status = ExportJob.Status.FAILED
+        job.error = str(e)
+        job.finished_date = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_date'])
+        return
+
+    job.status = ExportJob.Status.DONE
+    job.file_name = file_name
+    job.finished_date = timezone.now()
+    job.expires_date = job.finished_date + datetime.timedelta(
+        hours=settings.EXPORT_TTL_HOURS
+    )
+    job.save(update_fields=[
+        'status', 'file_name', 'rows_written', 'finished_date', 'expires_date'
+    ])
+
+
+@shared_task()
+def purge_expired_exports():
+    """Deletes export files whose download window has passed."""
+    expired = ExportJob.objects.filter(
+        status=ExportJob.Status.DONE,
+        expires_date__lte=timezone.now()
+    )
+    for job in expired:
+        path = export_path(job.file_name)
+        if os.path.exists(path):
+            os.remove(path)
+        job.status = ExportJob.Status.EXPIRED
+        job.save(update_fields=['status'])
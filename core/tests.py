@@ -1,3 +1,1164 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import io
+import os
+import tempfile
+from contextlib import contextmanager
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+from prometheus_client import REGISTRY
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from . import availability, slowqueries, views
+from .changelog import SETTLE_SECONDS, changes_since, latest_token
+from .datatables import (
+    DEFAULT_ORDER,
+    INVENTORY_COLUMNS,
+    MAX_PAGE_LENGTH,
+    inventory_page
+)
+from .exports import EXPORT_HEADERS, csv_lines, export_rows
+from .forms import NewUserForm
+from .importer import import_items, read_csv
+from .lookups import get_lookups, lookup_row
+from .models import (
+    Area,
+    ChangeLog,
+    ExportJob,
+    InventoryItem,
+    ItemNotes,
+    ItemStatus,
+    Manufacturer,
+    MapLocation,
+    SlowQuery,
+    User
+)
+from .querybudget import (
+    QueryBudgetExceeded,
+    QueryCounter,
+    assert_max_queries,
+    query_budget
+)
+from .rowcache import cached_rows
+from .summaries import rebuild_summaries
+from .synthetic import generate
+from .tasks import run_export_job
+
+
+# Keep the tests off the shared cache, which may hold another database's
+# lookups and versions
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'core-tests',
+    }
+}
+
+SMALL_COUNTS = {
+    'locations': 3,
+    'areas': 6,
+    'manufacturers': 4,
+    'assignees': 5,
+    'approvers': 2,
+    'users': 3,
+    'items': 30,
+    'notes': 60,
+}
+
+@contextmanager
+def eager_celery():
+    """Runs tasks in-process, as soon as they are queued."""
+    conf = run_export_job.app.conf
+    eager = conf.task_always_eager
+    conf.task_always_eager = True
+    try:
+        yield
+    finally:
+        conf.task_always_eager = eager
+
+
+# Each logged-in request loads the session and the user, outside any budget
+AUTH_QUERIES = 2
+
+
+@override_settings(CACHES=TEST_CACHES, QUERY_BUDGET_RAISE=True)
+class CoreTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        generate(SMALL_COUNTS, seed=7)
+        cls.user = User.objects.order_by('id').first()
+
+    def setUp(self):
+        cache.clear()
+
+
+class ImportTests(CoreTestCase):
+
+    def test_reimports_own_csv_export(self):
+        fields = (
+            'name', 'stat_id', 'item_location_id', 'item_area_id', 'mfg_id',
+            'model_no', 'serial_no', 'qty', 'total_cost', 'assigned_to_id',
+            'approved_by_id', 'approved_date', 'purchase_date'
+        )
+        before = list(
+            InventoryItem.objects.order_by('name').values_list(*fields)
+        )
+        self.assertTrue(any(row[9] for row in before))
+        exported = ''.join(csv_lines(export_rows())).encode()
+        InventoryItem.objects.all().delete()
+
+        result = import_items(read_csv(io.BytesIO(exported)), self.user)
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.created, len(before))
+        self.assertEqual(
+            list(InventoryItem.objects.order_by('name').values_list(*fields)),
+            before
+        )
+
+
+class SummaryTests(CoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def bulk_edit(self, count, **changes):
+        ids = InventoryItem.objects.order_by('id').values_list(
+            'id', flat=True
+        )[:count]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('core:bulk_edit_items'),
+                {'ids': ','.join(str(pk) for pk in ids), **changes}
+            )
+        self.assertEqual(response.status_code, 302)
+        return len(queries)
+
+    def test_bulk_edit_keeps_summaries_exact(self):
+        area = Area.objects.order_by('-id').first()
+        self.bulk_edit(
+            20,
+            stat=ItemStatus.objects.get(name='Retired').pk,
+            item_location=area.map_loc_id,
+            item_area=area.pk,
+            mfg=Manufacturer.objects.order_by('-id').first().pk
+        )
+        self.assertEqual(rebuild_summaries(), [])
+
+    def test_bulk_edit_queries_do_not_grow_with_selection(self):
+        mfg = Manufacturer.objects.order_by('id').first().pk
+        self.bulk_edit(1, mfg=mfg)
+        self.assertEqual(
+            self.bulk_edit(2, mfg=mfg), self.bulk_edit(25, mfg=mfg)
+        )
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class QueryBudgetTests(TestCase):
+
+    def test_counter_records_statements(self):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            User.objects.count()
+            User.objects.exists()
+        self.assertEqual(counter.count, 2)
+        self.assertIn('COUNT', counter.statements[0])
+
+    def test_assert_max_queries(self):
+        with assert_max_queries(1):
+            User.objects.count()
+        with self.assertRaisesMessage(AssertionError, 'over its budget of 1'):
+            with assert_max_queries(1):
+                User.objects.count()
+                User.objects.count()
+
+    def test_budget_raises_in_tests(self):
+        @query_budget(1)
+        def view(request):
+            User.objects.count()
+            User.objects.count()
+            return HttpResponse()
+
+        with self.assertRaises(QueryBudgetExceeded):
+            view(RequestFactory().get('/'))
+
+
+class ViewQueryTests(CoreTestCase):
+    """The busiest views stay within their budgets however many rows they
+    touch, so an N+1 query fails here."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.item = InventoryItem.objects.order_by('-note_count', 'id')[0]
+
+    def assert_budget(self, view):
+        return assert_max_queries(view.query_budget + AUTH_QUERIES)
+
+    def item_data(self, item):
+        return {
+            'name': item.name,
+            'stat': item.stat_id,
+            'description': item.description,
+            'item_location': item.item_location_id,
+            'item_area': item.item_area_id,
+            'mfg': item.mfg_id,
+            'model_no': item.model_no,
+            'serial_no': item.serial_no or '',
+            'qty': item.qty,
+            'total_cost': item.total_cost or '',
+            'assigned_to': item.assigned_to_id or '',
+            'approved_by': item.approved_by_id,
+            'approved_date': item.approved_date,
+            'purchase_date': item.purchase_date,
+        }
+
+    def test_inventory_data(self):
+        path = reverse('core:inventory_data')
+        pages = [
+            {'draw': 1, 'start': 0, 'length': 25},
+            {
+                'draw': 2,
+                'start': 0,
+                'length': 25,
+                'search[value]': 'a',
+                'order[0][column]': 2,
+                'order[0][dir]': 'asc',
+            },
+        ]
+        for params in pages:
+            with self.assert_budget(views.inventory_data):
+                response = self.client.get(path, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(len(response.json()['data']), 5)
+
+    def test_edit_item(self):
+        path = reverse('core:edit_item', args=[self.item.pk])
+        with self.assert_budget(views.edit_item):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        with self.assert_budget(views.edit_item):
+            response = self.client.post(path, self.item_data(self.item))
+        self.assertEqual(response.status_code, 302)
+
+    def test_notes(self):
+        self.assertGreater(self.item.note_count, 5)
+        path = reverse('core:notes', args=[self.item.pk])
+        with self.assert_budget(views.notes):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        with self.assert_budget(views.notes):
+            response = self.client.post(path, {'comment': 'Checked.'})
+        self.assertEqual(
+            ItemNotes.objects.filter(item=self.item).count(),
+            self.item.note_count + 1
+        )
+
+    def test_bulk_edit_items(self):
+        ids = InventoryItem.objects.order_by('id').values_list(
+            'id', flat=True
+        )[:25]
+        area = Area.objects.order_by('-id').first()
+        with self.assert_budget(views.bulk_edit_items):
+            response = self.client.post(reverse('core:bulk_edit_items'), {
+                'ids': ','.join(str(pk) for pk in ids),
+                'stat': ItemStatus.objects.get(name='Spare').pk,
+                'item_location': area.map_loc_id,
+                'item_area': area.pk,
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            InventoryItem.objects.filter(id__in=ids, item_area=area).count(),
+            25
+        )
+
+
+class ChangeFeedTests(CoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.items = list(InventoryItem.objects.order_by('id')[:3])
+
+    def settle(self):
+        ChangeLog.objects.update(
+            changed_date=timezone.now() - datetime.timedelta(
+                seconds=SETTLE_SECONDS + 1
+            )
+        )
+
+    def feed(self, **params):
+        response = self.client.get(reverse('core:changes'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_token_leaves_unsettled_changes_to_the_feed(self):
+        self.items[0].save()
+        self.settle()
+        token = self.feed()['next']
+        self.assertEqual(token, ChangeLog.objects.get().id)
+
+        # Not settled yet: neither the token nor the feed moves past it
+        self.items[1].save()
+        self.assertEqual(latest_token(), token)
+        self.assertEqual(self.feed(since=token)['changes'], [])
+
+        self.settle()
+        changes = self.feed(since=token)['changes']
+        self.assertEqual(
+            [change['id'] for change in changes], [self.items[1].pk]
+        )
+        self.assertEqual(changes[0]['data']['name'], self.items[1].name)
+
+    def test_deletes_carry_no_data(self):
+        item = self.items[0]
+        item_id = item.pk
+        item.delete()
+        self.settle()
+        changes = self.feed(since=0)['changes']
+        # The item's notes go with it
+        self.assertEqual(
+            {change['kind'] for change in changes[:-1]},
+            {ChangeLog.Kind.NOTE}
+        )
+        self.assertEqual(
+            (changes[-1]['kind'], changes[-1]['id'], changes[-1]['action']),
+            (ChangeLog.Kind.ITEM, item_id, ChangeLog.Action.DELETE)
+        )
+        self.assertTrue(all(change['data'] is None for change in changes))
+
+    def test_pages_follow_next(self):
+        for item in self.items:
+            item.save()
+        self.settle()
+
+        seen = []
+        token = 0
+        while True:
+            page = self.feed(since=token, limit=2)
+            seen.extend(change['id'] for change in page['changes'])
+            token = page['next']
+            if not page['more']:
+                break
+        self.assertEqual(seen, [item.pk for item in self.items])
+        self.assertEqual(token, latest_token())
+        self.assertEqual(changes_since(token)['changes'], [])
+
+    def test_bad_token(self):
+        response = self.client.get(reverse('core:changes'), {'since': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalRequestTests(CoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.path = reverse('core:inventory_data')
+        self.params = {'start': 0, 'length': 10}
+
+    def test_etag_changes_after_an_edit(self):
+        response = self.client.get(self.path, self.params)
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(
+                self.path, self.params, HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            304
+        )
+        # Another query string is another resource
+        self.assertEqual(
+            self.client.get(
+                self.path, {**self.params, 'draw': 3}, HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            200
+        )
+
+        item = InventoryItem.objects.order_by('id').first()
+        item.description = 'Edited'
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        response = self.client.get(
+            self.path, self.params, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_draw_is_echoed_when_sent(self):
+        page = self.client.get(self.path, {**self.params, 'draw': 7}).json()
+        self.assertEqual(page['draw'], 7)
+        page = self.client.get(self.path, self.params).json()
+        self.assertNotIn('draw', page)
+
+
+class InventoryTableTests(CoreTestCase):
+
+    def page(self, **params):
+        return inventory_page(InventoryItem.objects.all(), params)
+
+    def ids(self, page):
+        return [row['id'] for row in page['data']]
+
+    def expected_ids(self, *ordering, **filters):
+        return list(
+            InventoryItem.objects.filter(**filters).order_by(
+                *ordering
+            ).values_list('id', flat=True)
+        )
+
+    def test_orders_by_each_column(self):
+        for index, column in enumerate(INVENTORY_COLUMNS):
+            if not column.fields:
+                continue
+            for direction, prefix in (('asc', ''), ('desc', '-')):
+                with self.subTest(column=column.name, direction=direction):
+                    page = self.page(**{
+                        'length': 100,
+                        'order[0][column]': index,
+                        'order[0][dir]': direction,
+                    })
+                    self.assertEqual(
+                        self.ids(page),
+                        self.expected_ids(
+                            *[prefix + field for field in column.fields],
+                            'id'
+                        )
+                    )
+
+    def test_column_filters(self):
+        item = InventoryItem.objects.select_related(
+            'item_location'
+        ).order_by('id').first()
+        location = INVENTORY_COLUMNS.index(
+            next(c for c in INVENTORY_COLUMNS if c.name == 'item_location')
+        )
+        qty = INVENTORY_COLUMNS.index(
+            next(c for c in INVENTORY_COLUMNS if c.name == 'qty')
+        )
+        purchase_date = INVENTORY_COLUMNS.index(
+            next(c for c in INVENTORY_COLUMNS if c.name == 'purchase_date')
+        )
+
+        page = self.page(**{
+            f'columns[{location}][search][value]':
+                item.item_location.name.upper(),
+            'length': 100,
+        })
+        expected = InventoryItem.objects.filter(
+            item_location=item.item_location
+        ).count()
+        self.assertEqual(page['recordsTotal'], 30)
+        self.assertEqual(page['recordsFiltered'], expected)
+        self.assertEqual(len(page['data']), expected)
+        self.assertTrue(all(
+            row['item_location'] == item.item_location.name
+            for row in page['data']
+        ))
+
+        page = self.page(**{
+            f'columns[{qty}][search][value]': str(item.qty),
+            f'columns[{purchase_date}][search][value]':
+                str(item.purchase_date.year),
+        })
+        self.assertEqual(
+            page['recordsFiltered'],
+            InventoryItem.objects.filter(
+                qty=item.qty, purchase_date__year=item.purchase_date.year
+            ).count()
+        )
+
+        # A number column searched for text matches nothing
+        page = self.page(**{f'columns[{qty}][search][value]': 'many'})
+        self.assertEqual(
+            (page['recordsTotal'], page['recordsFiltered'], page['data']),
+            (30, 0, [])
+        )
+
+    def test_global_search(self):
+        item = InventoryItem.objects.order_by('id').first()
+        page = self.page(**{'search[value]': item.name, 'length': 100})
+        self.assertIn(item.pk, self.ids(page))
+        self.assertLess(page['recordsFiltered'], page['recordsTotal'])
+
+    def test_bad_paging_and_order_values(self):
+        default = self.expected_ids(
+            *[
+                ('-' if direction == 'desc' else '') + field
+                for index, direction in DEFAULT_ORDER
+                for field in INVENTORY_COLUMNS[index].fields
+            ],
+            'id'
+        )
+        cases = [
+            ({'start': 'x', 'length': 'y'}, default[:10]),
+            ({'start': -5, 'length': 5}, default[:5]),
+            ({'start': 25, 'length': -1}, default[25:]),
+            ({'length': MAX_PAGE_LENGTH + 1}, default),
+            ({'order[0][column]': 99, 'length': 100}, default),
+            ({'order[0][column]': 'x', 'length': 100}, default),
+            (
+                {
+                    'order[0][column]': 0,
+                    'order[0][dir]': 'sideways',
+                    'length': 100,
+                },
+                self.expected_ids('id')
+            ),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                self.assertEqual(self.ids(self.page(**params)), expected)
+
+
+class ExportTests(CoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def export(self, **params):
+        return self.client.get(reverse('core:export_to_excel'), params)
+
+    def test_csv_follows_search_filters_and_order(self):
+        location = INVENTORY_COLUMNS.index(
+            next(c for c in INVENTORY_COLUMNS if c.name == 'item_location')
+        )
+        total_cost = INVENTORY_COLUMNS.index(
+            next(c for c in INVENTORY_COLUMNS if c.name == 'total_cost')
+        )
+        item = InventoryItem.objects.select_related(
+            'item_location'
+        ).order_by('id').first()
+        params = {
+            'search[value]': item.name[:1],
+            f'columns[{location}][search][value]': item.item_location.name,
+            'order[0][column]': total_cost,
+            'order[0][dir]': 'desc',
+        }
+        # Paging is not part of an export
+        response = self.export(start=1, length=1, **params)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.reader(io.StringIO(content)))[1:]
+
+        # The same rows, in the same order, as the table shows
+        table = inventory_page(
+            InventoryItem.objects.all(), {**params, 'length': -1}
+        )
+        self.assertEqual(
+            [int(row[0]) for row in rows],
+            [row['id'] for row in table['data']]
+        )
+        self.assertLess(1, len(rows))
+        self.assertLess(len(rows), table['recordsTotal'])
+        location_name = EXPORT_HEADERS.index('Location')
+        cost = EXPORT_HEADERS.index('Total Cost')
+        self.assertEqual(
+            {row[location_name] for row in rows}, {item.item_location.name}
+        )
+        costs = [Decimal(row[cost]) for row in rows if row[cost]]
+        self.assertEqual(costs, sorted(costs, reverse=True))
+
+    def test_xlsx_keeps_dates_and_numbers(self):
+        response = self.export(format='xlsx')
+        self.assertEqual(response.status_code, 200)
+        workbook = load_workbook(
+            io.BytesIO(b''.join(response.streaming_content)), read_only=True
+        )
+        rows = workbook['Inventory'].iter_rows()
+        self.assertEqual([cell.value for cell in next(rows)], EXPORT_HEADERS)
+
+        items = {
+            item.pk: item for item in InventoryItem.objects.all()
+        }
+        id_column = EXPORT_HEADERS.index('ID')
+        cost = EXPORT_HEADERS.index('Total Cost')
+        qty = EXPORT_HEADERS.index('Qty')
+        purchase_date = EXPORT_HEADERS.index('Purchase Date')
+        count = 0
+        for row in rows:
+            item = items[row[id_column].value]
+            self.assertEqual(row[qty].value, item.qty)
+            self.assertEqual(
+                Decimal(str(row[cost].value)), item.total_cost
+            )
+            self.assertEqual(row[cost].number_format, '#,##0.00')
+            self.assertIsInstance(row[purchase_date].value, datetime.datetime)
+            self.assertEqual(
+                row[purchase_date].value.date(), item.purchase_date
+            )
+            self.assertEqual(row[purchase_date].number_format, 'mm/dd/yyyy')
+            count += 1
+        self.assertEqual(count, len(items))
+
+    def test_parquet_keeps_types_and_dictionary_encodes_lookups(self):
+        response = self.export(format='parquet')
+        self.assertEqual(response.status_code, 200)
+        parquet = pq.ParquetFile(
+            io.BytesIO(b''.join(response.streaming_content))
+        )
+        table = parquet.read()
+
+        schema = table.schema
+        self.assertEqual(schema.field('purchase_date').type, pa.date32())
+        self.assertEqual(
+            schema.field('total_cost').type, pa.decimal128(8, 2)
+        )
+        self.assertTrue(pa.types.is_dictionary(schema.field('location').type))
+        row_group = parquet.metadata.row_group(0)
+        location = row_group.column(schema.get_field_index('location'))
+        self.assertIsNotNone(location.dictionary_page_offset)
+        self.assertTrue(
+            {'PLAIN_DICTIONARY', 'RLE_DICTIONARY'} & set(location.encodings)
+        )
+
+        items = InventoryItem.objects.select_related('item_location')
+        expected = {
+            item.pk: (
+                item.purchase_date,
+                item.total_cost,
+                item.item_location.name
+            )
+            for item in items
+        }
+        self.assertEqual(
+            {
+                row['id']: (
+                    row['purchase_date'],
+                    row['total_cost'],
+                    row['location']
+                )
+                for row in table.to_pylist()
+            },
+            expected
+        )
+
+
+class ExportJobTests(CoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.export_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.export_root.cleanup)
+
+    def test_job_writes_the_filtered_export(self):
+        location = INVENTORY_COLUMNS.index(
+            next(c for c in INVENTORY_COLUMNS if c.name == 'item_location')
+        )
+        item = InventoryItem.objects.select_related(
+            'item_location'
+        ).order_by('id').first()
+        query = f'columns[{location}][search][value]={item.item_location}'
+        with eager_celery(), self.settings(
+            EXPORT_ROOT=self.export_root.name
+        ):
+            response = self.client.post(
+                reverse('core:start_export'),
+                {'file_format': 'csv', 'query': query}
+            )
+            self.assertRedirects(response, reverse('core:export_jobs'))
+
+            job = ExportJob.objects.get()
+            expected = InventoryItem.objects.filter(
+                item_location=item.item_location
+            ).count()
+            self.assertEqual(job.status, ExportJob.Status.DONE)
+            self.assertEqual(
+                (job.total_rows, job.rows_written), (expected, expected)
+            )
+            self.assertIsNotNone(job.expires_date)
+
+            response = self.client.get(
+                reverse('core:download_export', args=[job.pk])
+            )
+            self.assertEqual(response.status_code, 200)
+            content = b''.join(response.streaming_content).decode()
+            response.close()
+        self.assertEqual(len(content.splitlines()), expected + 1)
+        self.assertEqual(os.listdir(self.export_root.name), [job.file_name])
+
+    def test_failure_before_writing_marks_the_job_failed(self):
+        # EXPORT_ROOT cannot be created under a regular file
+        blocker = os.path.join(self.export_root.name, 'file')
+        open(blocker, 'w').close()
+        job = ExportJob.objects.create(requested_by=self.user)
+        with self.settings(EXPORT_ROOT=os.path.join(blocker, 'exports')):
+            with self.assertLogs('core.tasks', 'ERROR'):
+                run_export_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.Status.FAILED)
+        self.assertTrue(job.error)
+        self.assertIsNotNone(job.finished_date)
+        self.assertFalse(job.is_active)
+
+
+class LookupCacheTests(CoreTestCase):
+
+    def names(self, name):
+        return [row['name'] for row in get_lookups()[name]]
+
+    def test_warm_lookups_need_no_queries(self):
+        get_lookups()
+        with self.assertNumQueries(0):
+            get_lookups()
+
+    def test_save_and_delete_invalidate(self):
+        location = MapLocation.objects.order_by('id').first()
+        cases = [
+            ('item_location', MapLocation, {}),
+            ('item_area', Area, {'map_loc': location}),
+            ('mfg', Manufacturer, {}),
+            ('stat', ItemStatus, {}),
+        ]
+        for name, model, extra in cases:
+            with self.subTest(model=model.__name__):
+                get_lookups()
+                with self.captureOnCommitCallbacks(execute=True):
+                    row = model.objects.create(name='Added', **extra)
+                self.assertIn('Added', self.names(name))
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    row.name = 'Renamed'
+                    row.save()
+                self.assertEqual(lookup_row(name, row.pk)['name'], 'Renamed')
+                self.assertNotIn('Added', self.names(name))
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    row.delete()
+                self.assertNotIn('Renamed', self.names(name))
+
+
+class RowCacheTests(CoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.item = InventoryItem.objects.select_related(
+            'item_location', 'inserted_by'
+        ).order_by('id').first()
+
+    def row(self):
+        return cached_rows([self.item.pk])[0]
+
+    def test_cached_rows_need_no_item_query(self):
+        ids = list(
+            InventoryItem.objects.order_by('id').values_list('id', flat=True)
+        )
+        self.assertEqual([row['id'] for row in cached_rows(ids)], ids)
+        with self.assertNumQueries(0):
+            cached_rows(ids)
+
+    def test_item_edit_retires_row(self):
+        self.row()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.name = 'Renamed item'
+            self.item.save()
+        self.assertEqual(self.row()['name'], 'Renamed item')
+
+    def test_user_rename_retires_row(self):
+        self.row()
+        with self.captureOnCommitCallbacks(execute=True):
+            user = self.item.inserted_by
+            user.last_name = 'Renamed'
+            user.save(update_fields=['last_name'])
+        self.assertEqual(
+            self.row()['inserted_by'], f'Renamed, {user.first_name}'
+        )
+
+    def test_location_rename_retires_row(self):
+        self.row()
+        with self.captureOnCommitCallbacks(execute=True):
+            location = self.item.item_location
+            location.name = 'Renamed location'
+            location.save()
+        self.assertEqual(self.row()['item_location'], 'Renamed location')
+
+
+class AvailabilityTests(CoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        availability._local.clear()
+        self.addCleanup(availability._local.clear)
+
+    def check(self, field, value, **extra):
+        return self.client.post(
+            reverse(f'core:check_{field}'), {field: value}, **extra
+        )
+
+    def test_ignores_case_and_whitespace(self):
+        self.assertTrue(availability.is_taken(
+            'username', f' {self.user.username.swapcase()} '
+        ))
+        self.assertTrue(
+            availability.is_taken('email', self.user.email.upper())
+        )
+        self.assertFalse(availability.is_taken('username', 'nobody-here'))
+
+    def test_filter_and_cache_answer_without_queries(self):
+        availability.is_taken('username', self.user.username)
+        with self.assertNumQueries(0):
+            # A filter miss, then a cached "taken"
+            self.assertFalse(availability.is_taken('username', 'nobody'))
+            self.assertTrue(
+                availability.is_taken('username', self.user.username)
+            )
+
+    def test_email_change_frees_the_old_address(self):
+        old_email = self.user.email
+        self.assertTrue(availability.is_taken('email', old_email))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.email = 'changed@example.com'
+            self.user.save()
+        self.assertFalse(availability.is_taken('email', old_email))
+        self.assertTrue(
+            availability.is_taken('email', 'CHANGED@example.com')
+        )
+
+    def test_delete_frees_the_names(self):
+        user = User.objects.order_by('id').last()
+        self.assertTrue(availability.is_taken('username', user.username))
+        with self.captureOnCommitCallbacks(execute=True):
+            user.delete()
+        self.assertFalse(availability.is_taken('username', user.username))
+        self.assertFalse(availability.is_taken('email', user.email))
+
+    def test_sign_up_form_uses_the_same_rule(self):
+        form = NewUserForm({
+            'first_name': 'New',
+            'last_name': 'User',
+            'username': self.user.username.upper(),
+            'email': self.user.email.upper(),
+            'password1': 'a-long-Password-1',
+            'password2': 'a-long-Password-1',
+        })
+        form.fields.pop('captcha')
+        self.assertFalse(form.is_valid())
+        self.assertIn('username', form.errors)
+        self.assertEqual(form.errors['email'], ['This email already exists!'])
+
+    def test_views_answer(self):
+        response = self.check('username', self.user.username.upper())
+        self.assertContains(response, 'already exists')
+        response = self.check('email', 'nobody@example.com')
+        self.assertContains(response, 'is available')
+
+    @override_settings(RATE_LIMIT_CLIENT_HEADER='HTTP_X_FORWARDED_FOR')
+    # Early in a window, so it cannot roll over during the test
+    @mock.patch('core.ratelimit.time.time', return_value=6_000_000_001.0)
+    def test_rate_limit(self, _):
+        # The proxy appends the address it saw; what the client sent first
+        # is not trusted
+        client = {'HTTP_X_FORWARDED_FOR': '10.0.0.9, 192.0.2.1'}
+        for i in range(30):
+            forwarded = {'HTTP_X_FORWARDED_FOR': f'10.0.0.{i}, 192.0.2.1'}
+            response = self.check('username', 'nobody', **forwarded)
+            self.assertEqual(response.status_code, 200)
+
+        response = self.check('email', 'nobody@example.com', **client)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '59')
+
+        other = {'HTTP_X_FORWARDED_FOR': '10.0.0.9, 192.0.2.2'}
+        response = self.check('username', 'nobody', **other)
+        self.assertEqual(response.status_code, 200)
+
+
+class ItemApiTests(CoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def get(self, **params):
+        return self.client.get(reverse('core:api_items'), params)
+
+    def follow(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            ids += [row['id'] for row in page['results']]
+            url = page['next']
+        return ids
+
+    def test_pages_through_ties_on_purchase_date(self):
+        # Three dates shared by every item, so pages split runs of ties
+        dates = [datetime.date(2023, month, 1) for month in (1, 2, 3)]
+        for item_id in InventoryItem.objects.values_list('id', flat=True):
+            InventoryItem.objects.filter(id=item_id).update(
+                purchase_date=dates[item_id % 3]
+            )
+        url = reverse('core:api_items') + (
+            '?order=-purchase_date&fields=id&limit=4'
+        )
+        self.assertEqual(
+            self.follow(url),
+            list(InventoryItem.objects.order_by(
+                '-purchase_date', 'id'
+            ).values_list('id', flat=True))
+        )
+
+    def test_pages_by_id(self):
+        url = reverse('core:api_items') + '?fields=id,name&limit=7'
+        self.assertEqual(
+            self.follow(url),
+            list(InventoryItem.objects.order_by(
+                'id'
+            ).values_list('id', flat=True))
+        )
+
+    def test_malformed_cursors(self):
+        def encode(key):
+            return base64.urlsafe_b64encode(key).decode().rstrip('=')
+
+        cases = [
+            ('id', '!!!'),
+            ('id', encode(b'abc')),
+            ('id', encode(b'\xff\xfe')),
+            ('-purchase_date', encode(b'12')),
+            ('-purchase_date', encode(b'2023-13-01|5')),
+            ('-purchase_date', encode(b'2023-01-01|x')),
+            ('-purchase_date', encode(b'2023-01-01|5|6')),
+        ]
+        for order, cursor in cases:
+            with self.subTest(order=order, cursor=cursor):
+                response = self.get(order=order, cursor=cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Invalid cursor.'})
+
+
+class LocationTreeTests(CoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def tree(self, **extra):
+        return self.client.get(reverse('core:location_tree'), **extra)
+
+    def test_nests_areas_under_locations(self):
+        tree = self.tree().json()
+        self.assertEqual(
+            [location['name'] for location in tree['locations']],
+            list(MapLocation.objects.order_by(
+                'name', 'id'
+            ).values_list('name', flat=True))
+        )
+        for location in tree['locations']:
+            self.assertEqual(
+                [area['id'] for area in location['areas']],
+                list(Area.objects.filter(
+                    map_loc_id=location['id']
+                ).order_by('name', 'id').values_list('id', flat=True))
+            )
+
+    def test_versioned_url_is_cached(self):
+        version = self.tree().json()['version']
+        response = self.client.get(
+            reverse('core:location_tree'), {'v': version}
+        )
+        self.assertIn('max-age=86400', response['Cache-Control'])
+        response = self.client.get(reverse('core:location_tree'), {'v': 1})
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_etag_follows_the_lookups(self):
+        etag = self.tree()['ETag']
+        self.assertEqual(self.tree(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        area = Area.objects.order_by('id').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            area.name = 'Renamed area'
+            area.save()
+        response = self.tree(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        names = [
+            a['name']
+            for location in response.json()['locations']
+            for a in location['areas']
+        ]
+        self.assertIn('Renamed area', names)
+
+    def test_bulk_edit_area_choice_leaves_the_area(self):
+        location = MapLocation.objects.order_by('id').first()
+        response = self.client.get(
+            reverse('core:load_areas'),
+            {'item_location': location.pk, 'no_change': 1}
+        )
+        self.assertContains(
+            response,
+            '<option selected="true" value="">--- No change ---</option>',
+            html=True
+        )
+        self.assertNotContains(response, 'Select an Area')
+
+        response = self.client.get(
+            reverse('core:load_areas'), {'item_location': location.pk}
+        )
+        self.assertContains(response, 'Select an Area')
+
+        response = self.client.get(reverse('core:inventory'))
+        self.assertContains(response, 'var noChange = true;')
+        response = self.client.get(reverse('core:add_item'))
+        self.assertContains(response, 'var noChange = false;')
+
+
+class ProfilingTests(CoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        profile_root = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_root.cleanup)
+        self.root = profile_root.name
+        settings = self.settings(PROFILE_ROOT=self.root, PROFILE_KEEP=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def saved(self):
+        return sorted(
+            name for name in os.listdir(self.root) if name.endswith('.json')
+        )
+
+    def test_staff_only(self):
+        url = reverse('core:inventory') + '?profile=1'
+        self.client.get(url)
+        self.assertEqual(self.saved(), [])
+
+        self.client.force_login(self.user)
+        self.client.get(url)
+        self.assertEqual(self.saved(), [])
+
+        self.user.is_staff = True
+        self.user.save(update_fields=['is_staff'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.saved()), 1)
+        self.assertEqual(
+            len(os.listdir(self.root)), 2, 'a .folded file per profile'
+        )
+
+    def test_keeps_the_newest(self):
+        self.user.is_staff = True
+        self.user.save(update_fields=['is_staff'])
+        self.client.force_login(self.user)
+        for _ in range(3):
+            self.client.get(reverse('core:inventory'), HTTP_X_PROFILE='1')
+        self.assertEqual(len(self.saved()), 2)
+        self.assertEqual(len(os.listdir(self.root)), 4)
+
+    def test_profiles_page_refuses_others(self):
+        response = self.client.get(reverse('core:profiles'))
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('core:profiles'))
+        self.assertEqual(response.status_code, 302)
+
+
+class MetricsTests(CoreTestCase):
+
+    def sample(self, name, view):
+        return REGISTRY.get_sample_value(name, {'view': view}) or 0
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        url = reverse('core:metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'django_request_duration_seconds')
+
+    @override_settings(METRICS_TOKEN='')
+    def test_no_token_refuses_all_but_staff(self):
+        url = reverse('core:metrics')
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
+        self.user.is_staff = True
+        self.user.save(update_fields=['is_staff'])
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_counts_queries_run_while_streaming(self):
+        self.client.force_login(self.user)
+        view = 'core:export_to_excel'
+        name = 'django_request_db_queries_sum'
+        before = self.sample(name, view)
+        response = self.client.get(reverse(view))
+        # Nothing is recorded until the body has been sent
+        self.assertEqual(self.sample(name, view), before)
+        with CaptureQueriesContext(connection) as streamed:
+            b''.join(response.streaming_content)
+        response.close()
+        self.assertTrue(streamed)
+        self.assertGreaterEqual(
+            self.sample(name, view) - before, len(streamed)
+        )
+
+
+class SlowQueryTests(CoreTestCase):
+
+    @override_settings(SLOW_QUERY_MS=1e-9, SLOW_QUERY_KEEP=5)
+    def test_records_and_prunes(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('core:inventory_data'))
+        queries = list(SlowQuery.objects.all())
+        self.assertTrue(queries)
+        self.assertLessEqual(len(queries), 5)
+        self.assertTrue(all(
+            query.view_name == 'core:inventory_data' for query in queries
+        ))
+        self.assertTrue(any(
+            query.frame.startswith('core/') for query in queries
+        ))
+
+        for _ in range(3):
+            self.client.get(reverse('core:inventory_data'))
+        self.assertEqual(SlowQuery.objects.count(), 5)
+
+    @override_settings(SLOW_QUERY_MS=1e-9)
+    def test_records_task_queries(self):
+        class Task:
+            name = 'core.tasks.example'
+
+        wrappers = list(connection.execute_wrappers)
+        slowqueries.task_started(task_id='t1')
+        InventoryItem.objects.count()
+        slowqueries.task_finished(task_id='t1', task=Task())
+        self.assertEqual(connection.execute_wrappers, wrappers)
+        self.assertTrue(SlowQuery.objects.filter(
+            view_name='task:core.tasks.example',
+            frame__contains='test_records_task_queries'
+        ).exists())
+
+
+class SyntheticDataTests(CoreTestCase):
+
+    def test_numbers_past_deleted_rows(self):
+        # With older rows gone, a count-based numbering would reuse
+        # the names and serials of the newest
+        for model in (InventoryItem, User):
+            model.objects.filter(id__in=list(
+                model.objects.order_by('id').values_list('id', flat=True)[1:4]
+            )).delete()
+
+        items = InventoryItem.objects.count()
+        users = User.objects.count()
+        generate({**SMALL_COUNTS, 'items': 10, 'notes': 0}, seed=8)
+        self.assertEqual(InventoryItem.objects.count(), items + 10)
+        self.assertEqual(User.objects.count(), users + SMALL_COUNTS['users'])
@@ -13,13 +13,56 @@ app_name = "core"
 urlpatterns = [
     path("", views.index, name="index"),
     path("core/inventory", views.inventory, name="inventory"),
+    path("core/dashboard", views.dashboard, name="dashboard"),
+    path(
+        "core/inventory/data", views.inventory_data, name="inventory_data"
+    ),
+    path(
+        "core/inventory/bulk_edit",
+        views.bulk_edit_items,
+        name="bulk_edit_items"
+    ),
     path("core/add_item", views.add_item, name="add_item"),
     path("core/edit_item/<int:id>", views.edit_item, name="edit_item"),
     path("core/load_areas", views.load_areas, name="load_areas"),
+    path(
+        "core/location_tree", views.location_tree, name="location_tree"
+    ),
     path("core/notes/<int:id>", views.notes, name="notes"),
+    path("core/api/items", views.api_items, name="api_items"),
+    path("core/api/lookups", views.api_lookups, name="api_lookups"),
+    path("core/api/changes", views.changes, name="changes"),
+    path(
+        "core/import", views.import_inventory, name="import_inventory"
+    ),
     path(
         "core/export_to_excel", views.export_to_excel, name="export_to_excel"
     ),
+    path("core/exports", views.export_jobs, name="export_jobs"),
+    path("core/exports/start", views.start_export, name="start_export"),
+    path(
+        "core/exports/<int:id>/status",
+        views.export_status,
+        name="export_status"
+    ),
+    path(
+        "core/exports/<int:id>/download",
+        views.download_export,
+        name="download_export"
+    ),
+    path("core/profiles", views.profiles, name="profiles"),
+    path(
+        "core/profiles/<str:name>",
+        views.profile_detail,
+        name="profile_detail"
+    ),
+    path(
+        "core/profiles/<str:name>/download",
+        views.download_profile,
+        name="download_profile"
+    ),
+    path("core/slow-queries", views.slow_queries, name="slow_queries"),
+    path("core/metrics", views.metrics, name="metrics"),
     path("accounts/logout/", views.logout_request, name="logout_request"),
     path("accounts/login/", views.login_request, name="login_request"),
     path("register/", views.register, name="register"),
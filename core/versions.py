@@ -0,0 +1,50 @@
+import datetime
+import time
+
+from django.core.cache import cache
+
+
+class VersionMarker:
+    """A counter in the shared cache that is bumped whenever some data
+    changes, plus the time of the last bump.
+
+    Cached copies and ETags are keyed on the version, so a bump
+    invalidates all of them at once.
+    """
+
+    def __init__(self, name):
+        self.version_key = f'{name}:version'
+        self.modified_key = f'{name}:modified'
+
+    @staticmethod
+    def _new_version():
+        # Time based, so a version minted after the shared cache was
+        # flushed never matches one a process still holds
+        return int(time.time() * 1000)
+
+    def version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, self._new_version(), timeout=None)
+            cache.add(self.modified_key, int(time.time()), timeout=None)
+            version = cache.get(self.version_key)
+        return version
+
+    def modified(self):
+        """When the data last changed, or None if that is not known."""
+        timestamp = cache.get(self.modified_key)
+        if timestamp is None:
+            return None
+        return datetime.datetime.fromtimestamp(
+            timestamp, tz=datetime.timezone.utc
+        )
+
+    def bump(self):
+        """Returns the new version."""
+        try:
+            version = cache.incr(self.version_key)
+        except ValueError:
+            version = self._new_version()
+            cache.set(self.version_key, version, timeout=None)
+        cache.set(self.modified_key, int(time.time()), timeout=None)
+        return version
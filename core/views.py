@@ -1,27 +1,44 @@
-import os
 import csv
+import hashlib
+import hmac
+import os
 import datetime
+import tempfile
 
 from pytz import timezone
-from django.shortcuts import render, redirect
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    JsonResponse,
+    QueryDict,
+    StreamingHttpResponse
+)
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import (
+    condition,
+    require_POST,
+    require_safe
+)
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.views import PasswordChangeView, logout_then_login
 from django.contrib.auth import (
     login, logout, authenticate, update_session_auth_hash
 )
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from .models import (
     User,
     InventoryItem,
     ItemNotes,
-    ItemStatus,
-    Area,
-    MapLocation,
-    Manufacturer,
-    Assignee,
-    ApprovalList
+    ExportJob,
+    SlowQuery
 )
 from .forms import (
     AuthenticationFormWithCaptchaField,
@@ -29,11 +46,45 @@ from .forms import (
     EditProfileForm,
     ContactForm,
     NoteForm,
-    InventoryForm
+    InventoryForm,
+    BulkEditForm
 )
 from django.core.mail import EmailMultiAlternatives
 from django.urls import reverse_lazy
 from .signals import log_user_logout
+from .datatables import filtered_inventory, inventory_page, table_params
+from .querybudget import query_budget
+from .ratelimit import rate_limit
+from .availability import is_taken
+from .exports import (
+    EXPORT_FORMATS,
+    csv_lines,
+    export_path,
+    export_rows,
+    write_export
+)
+from .tasks import run_export_job
+from .importer import import_items, read_upload
+from .summaries import dashboard_summaries
+from .api import ApiError, item_page
+from .rowcache import cached_rows
+from .metrics import render_metrics
+from .profiling import folded_path, load_profile, recent_profiles
+from .slowqueries import slow_query_summary
+from .changelog import (
+    INVENTORY_VERSION,
+    MAX_CHANGES,
+    changes_since,
+    latest_token
+)
+from .lookups import (
+    areas_for_location,
+    get_lookups,
+    lookup_except,
+    lookups_modified,
+    lookups_version,
+    location_tree as location_tree_data
+)
 
 
 EST = timezone('US/Eastern')
@@ -90,39 +141,247 @@ def index(request):
                   )
 
 
+def _etag(*parts):
+    key = '|'.join(str(part) for part in parts)
+    return '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+
+
+def _page_etag(request, *parts):
+    # Pages carry the user's name, a CSRF token and any flash messages, so
+    # they are only matched for the same user and CSRF secret, and never
+    # while a message is waiting to be shown
+    csrf_secret = request.META.get('CSRF_COOKIE')
+    if csrf_secret is None or len(messages.get_messages(request)):
+        return None
+    return _etag(request.user.pk, csrf_secret, *parts)
+
+
+def _inventory_etag(request, *args, **kwargs):
+    # Table data and exports depend on the items, the lookup names and the
+    # query string, and on nothing else
+    return _etag(
+        INVENTORY_VERSION.version(),
+        lookups_version(),
+        request.get_full_path()
+    )
+
+
+def _inventory_last_modified(request, *args, **kwargs):
+    # The same inputs as the ETag: a lookup rename changes the rows too
+    modified = [INVENTORY_VERSION.modified(), lookups_modified()]
+    if None in modified:
+        return None
+    return max(modified)
+
+
+def _inventory_page_etag(request):
+    return _page_etag(request, 'inventory', lookups_version())
+
+
+def _notes_etag(request, id):
+    return _page_etag(
+        request, 'notes', INVENTORY_VERSION.version(), request.get_full_path()
+    )
+
+
+def _revalidate(response):
+    # Let browsers keep the response but check the ETag before reusing it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @login_required
+@condition(etag_func=_inventory_page_etag)
+@query_budget(6)
 def inventory(request):
-    inventory_list = InventoryItem.objects.all()
-    return render(request=request,
+    # Rows are fetched a page at a time by the table from inventory_data;
+    # the bulk edit choices come from the lookup cache (no queries once warm)
+    lookups = get_lookups()
+    return _revalidate(render(request=request,
                   template_name="core/inventory.html",
                   context={
-                      'inventory_list': inventory_list
+                      'lookups_version': lookups_version(),
+                      'stats': lookups['stat'],
+                      'locations': lookups['item_location'],
+                      'assignees': lookups['assigned_to'],
+                      'approvers': lookups['approved_by']
                   }
-                  )
+                  ))
+
+
+@login_required
+@query_budget(7)
+def dashboard(request):
+    # Totals are read from the summary tables kept by core.summaries
+    tables = dashboard_summaries()
+    statuses = tables['status']
+    return render(
+        request=request,
+        template_name="core/dashboard.html",
+        context={
+            'tables': [
+                ('Location', tables['location']),
+                ('Area', tables['area']),
+                ('Status', statuses),
+                ('Manufacturer', tables['mfg']),
+            ],
+            'item_count': sum(row['item_count'] for row in statuses),
+            'total_qty': sum(row['total_qty'] for row in statuses),
+            'total_cost': sum(row['total_cost'] for row in statuses)
+        }
+    )
+
+
+@login_required
+@condition(
+    etag_func=_inventory_etag,
+    last_modified_func=_inventory_last_modified
+)
+@query_budget(4)
+def inventory_data(request):
+    # Formatted rows come from the row cache; only misses are queried
+    return _revalidate(JsonResponse(
+        inventory_page(
+            InventoryItem.objects.all(), request.GET, row_source=cached_rows
+        )
+    ))
+
+
+@login_required
+@require_POST
+# Up to 6 lookup loads on a cold cache, the area check, 7 for the update
+# whatever the selection (see BulkEditForm.save) and a savepoint pair when
+# already inside a transaction
+@query_budget(16)
+def bulk_edit_items(request):
+    form = BulkEditForm(request.POST)
+    if form.is_valid():
+        count = form.save(request.user)
+        messages.success(request, f'{count} items updated successfully!')
+    else:
+        messages.error(request, form.errors)
+    return redirect('core:inventory')
+
+
+@login_required
+@query_budget(3)
+def changes(request):
+    """Inventory changes after ``?since=<token>``, for incremental sync.
+
+    Without ``since`` it returns just the current token: get it first,
+    then take a full copy (e.g. an export), then poll with the token.
+    Changes made while copying come through again, so apply them as
+    upserts and deletes.
+    """
+    if 'since' not in request.GET:
+        return JsonResponse(
+            {'changes': [], 'next': latest_token(), 'more': False}
+        )
+    try:
+        since = int(request.GET['since'])
+        limit = int(request.GET.get('limit', MAX_CHANGES))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid since or limit.'}, status=400)
+    limit = min(max(limit, 1), MAX_CHANGES)
+    return JsonResponse(changes_since(since, limit))
 
 
 @login_required
 def load_areas(request):
     loc = request.GET.get('item_location')
-    areas = Area.objects.filter(map_loc=loc).order_by('name')
+    try:
+        areas = areas_for_location(int(loc))
+    except (TypeError, ValueError):
+        areas = []
     return render(
         request=request,
         template_name="core/areasOpts.html",
         context={
             'loc': loc,
-            'areas': areas
+            'areas': areas,
+            # For the bulk edit form, whose empty area means "leave it"
+            'no_change': 'no_change' in request.GET
         }
     )
 
 
+def _location_tree_etag(request):
+    return f'"lookups-{lookups_version()}"'
+
+
+def _location_tree_last_modified(request):
+    return lookups_modified()
+
+
+@login_required
+@condition(
+    etag_func=_location_tree_etag,
+    last_modified_func=_location_tree_last_modified
+)
+def location_tree(request):
+    tree = location_tree_data()
+    response = JsonResponse(tree)
+    if request.GET.get('v') == str(tree['version']):
+        # Pages link to the tree with its version in the URL, so that URL
+        # can be cached until the lookups change and the link does too
+        patch_cache_control(response, private=True, max_age=60 * 60 * 24)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @login_required
+@require_safe
+@condition(
+    etag_func=_inventory_etag,
+    last_modified_func=_inventory_last_modified
+)
+@query_budget(1)
+def api_items(request):
+    """Read-only inventory items, a page at a time.
+
+    ``fields=`` picks the columns, ``status``/``location``/``area``/``mfg``/
+    ``assigned_to`` filter by comma-separated ids, ``order`` is ``id`` or
+    ``-purchase_date``, and ``next`` is the URL of the following page.
+    """
+    try:
+        rows, next_cursor = item_page(request.GET)
+    except ApiError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    next_url = None
+    if next_cursor is not None:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(
+            f'{request.path}?{params.urlencode()}'
+        )
+    return _revalidate(JsonResponse({'results': rows, 'next': next_url}))
+
+
+@login_required
+@require_safe
+@condition(
+    etag_func=_location_tree_etag,
+    last_modified_func=_location_tree_last_modified
+)
+@query_budget(6)
+def api_lookups(request):
+    """The lookup tables the items API refers to by id."""
+    return _revalidate(JsonResponse(get_lookups()))
+
+
+@login_required
+@query_budget(10)
 def add_item(request):
-    stats = ItemStatus.objects.all().values().order_by('name').values()
-    areas = Area.objects.all().values().order_by('name').values()
-    locations = MapLocation.objects.all().values().order_by('name').values()
-    mfgs = Manufacturer.objects.all().order_by('name').values()
-    assignees = Assignee.objects.all().order_by('name').values()
-    approvers = ApprovalList.objects.all().order_by('name').values()
+    # Reference lists come from the lookup cache (see core.lookups)
+    lookups = get_lookups()
+    stats = lookups['stat']
+    areas = lookups['item_area']
+    locations = lookups['item_location']
+    mfgs = lookups['mfg']
+    assignees = lookups['assigned_to']
+    approvers = lookups['approved_by']
 
     if request.method == "POST":
         form = InventoryForm(request.POST)
@@ -170,6 +429,7 @@ def add_item(request):
             request=request,
             template_name="core/add_item.html",
             context={
+                'lookups_version': lookups_version(),
                 'stats': stats,
                 'areas': areas,
                 'locations': locations,
@@ -181,22 +441,27 @@ def add_item(request):
 
 
 @login_required
+@query_budget(13)
 def edit_item(request, id):
 
-    # Obtain record to edit by id
-    entry_to_edit = InventoryItem.objects.get(id=id)
+    # Obtain record to edit by id, along with every lookup the page prints
+    entry_to_edit = InventoryItem.objects.select_related(
+        'stat',
+        'item_location',
+        'item_area',
+        'mfg',
+        'assigned_to',
+        'approved_by',
+        'inserted_by'
+    ).get(id=id)
 
     # Obtain list of status in order by name, except the selected value
     # by id from the form
-    stat_list = ItemStatus.objects.exclude(
-        id=entry_to_edit.stat.pk
-    ).order_by('name')
+    stat_list = lookup_except('stat', entry_to_edit.stat_id)
 
     # Obtain list of locations in order by name, except the selected value
     # by id from the form
-    loc_list = MapLocation.objects.exclude(
-        id=entry_to_edit.item_location.pk
-    ).order_by('name')
+    loc_list = lookup_except('item_location', entry_to_edit.item_location_id)
 
     # Get area
     # current_area = entry_to_edit.location.name
@@ -205,25 +470,19 @@ def edit_item(request, id):
 
     # Obtain list of areas in order by name, except the selected value
     # by id from the form
-    area_list = Area.objects.filter(map_loc=entry_to_edit.item_location.pk).order_by('name')
+    area_list = areas_for_location(entry_to_edit.item_location_id)
 
     # Obtain list of manufacturers in order by name, except the selected value
     # by id from the form
-    mfg_list = Manufacturer.objects.exclude(
-        id=entry_to_edit.mfg.pk
-    ).order_by('name')
+    mfg_list = lookup_except('mfg', entry_to_edit.mfg_id)
 
     # Obtain list of assignees in order by name, except the selected value
     # by id from the form
-    assignee_list = Assignee.objects.exclude(
-        id=entry_to_edit.assigned_to.pk
-    ).order_by('name')
+    assignee_list = lookup_except('assigned_to', entry_to_edit.assigned_to_id)
 
     # Obtain list of approvers in order by name, except the selected value
     # by id from the form
-    approvers_list = ApprovalList.objects.exclude(
-        id=entry_to_edit.approved_by.pk
-    ).order_by('name')
+    approvers_list = lookup_except('approved_by', entry_to_edit.approved_by_id)
 
     if request.method == "POST":
         form = InventoryForm(request.POST, instance=entry_to_edit)
@@ -250,7 +509,12 @@ def edit_item(request, id):
             entry_to_edit.inserted_date = entry_to_edit.inserted_date
             entry_to_edit.modified_by = str(request.user)
             entry_to_edit.modified_date = datetime.datetime.now(tz=EST)
-            entry_to_edit.save()
+            # Leave note_count to its own counter updates.  In a transaction
+            # so the summaries read the old values under a row lock
+            with transaction.atomic():
+                entry_to_edit.save(update_fields=[
+                    *InventoryForm.Meta.fields, 'modified_by', 'modified_date'
+                ])
             messages.success(
                 request,
                 'Updated successfully!'
@@ -269,6 +533,7 @@ def edit_item(request, id):
             request=request,
             template_name='core/edit_item.html',
             context={
+                'lookups_version': lookups_version(),
                 'stat_list': stat_list,
                 'loc_list': loc_list,
                 'area_list': area_list,
@@ -281,10 +546,63 @@ def edit_item(request, id):
         )
 
 
+NOTES_PAGE_SIZE = 25
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _notes_cursor(note):
+    # Position of a note in newest-first order, as "<microseconds>_<id>"
+    micros = (note.inserted_date - EPOCH) // datetime.timedelta(microseconds=1)
+    return f'{micros}_{note.id}'
+
+
+def _notes_page(item_id, cursor=None):
+    """Returns a page of an item's notes, newest first, and the next cursor.
+
+    Pages are keyed on (inserted_date, id) rather than offsets, so each one
+    is a short range scan of notes_item_date_idx however deep it is.
+    """
+    item_notes = ItemNotes.objects.filter(item_id=item_id).only(
+        'id', 'comment', 'inserted_by', 'inserted_date'
+    ).order_by('-inserted_date', '-id')
+
+    if cursor:
+        try:
+            micros, note_id = (int(part) for part in cursor.split('_'))
+        except ValueError:
+            raise Http404('Invalid cursor.')
+        inserted_date = EPOCH + datetime.timedelta(microseconds=micros)
+        item_notes = item_notes.filter(
+            Q(inserted_date__lt=inserted_date)
+            | Q(inserted_date=inserted_date, id__lt=note_id)
+        )
+
+    page = list(item_notes[:NOTES_PAGE_SIZE + 1])
+    next_cursor = None
+    if len(page) > NOTES_PAGE_SIZE:
+        page = page[:NOTES_PAGE_SIZE]
+        next_cursor = _notes_cursor(page[-1])
+    return page, next_cursor
+
+
 @login_required
+@condition(etag_func=_notes_etag)
+@query_budget(4)
 def notes(request, id):
-    item = InventoryItem.objects.get(id=id)
-    item_notes = ItemNotes.objects.filter(item=item)
+    if request.method == "GET" and 'cursor' in request.GET:
+        # Next page for the infinite scroll
+        item_notes, next_cursor = _notes_page(id, request.GET['cursor'])
+        return _revalidate(render(
+            request=request,
+            template_name="core/includes/_note_rows.html",
+            context={
+                'item_id': id,
+                'item_notes': item_notes,
+                'next_cursor': next_cursor
+            }
+        ))
+
+    item = InventoryItem.objects.only('id', 'name').get(id=id)
 
     if request.method == "POST":
         form = NoteForm(request.POST)
@@ -304,86 +622,229 @@ def notes(request, id):
 
             return redirect('core:notes', id=id)
 
-        else:
-            return render(
-                request=request,
-                template_name="core/notes.html",
-                context={
-                    'item': item,
-                    'item_notes': item_notes
-                }
-            )
+    item_notes, next_cursor = _notes_page(id)
+    return _revalidate(render(
+        request=request,
+        template_name="core/notes.html",
+        context={
+            'item': item,
+            'item_id': id,
+            'item_notes': item_notes,
+            'next_cursor': next_cursor
+        }
+    ))
 
-    else:
-        form = NoteForm()
+
+@login_required
+@condition(
+    etag_func=_inventory_etag,
+    last_modified_func=_inventory_last_modified
+)
+def export_to_excel(request):
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        raise Http404('Unknown export format.')
+    export_format = EXPORT_FORMATS[file_format]
+
+    # Export what the inventory table is showing: its search, column
+    # filters and sort order are applied in the query
+    queryset = filtered_inventory(request.GET)
+
+    if file_format == 'csv':
+        response = StreamingHttpResponse(
+            csv_lines(export_rows(queryset)),
+            content_type=export_format.content_type
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="inventory.csv"'
+        )
+        return _revalidate(response)
+
+    # Binary formats are assembled on disk, then streamed from the file
+    export_file = tempfile.TemporaryFile()
+    write_export(file_format, export_file, queryset)
+    export_file.seek(0)
+    return _revalidate(FileResponse(
+        export_file,
+        as_attachment=True,
+        filename=f'inventory.{file_format}',
+        content_type=export_format.content_type
+    ))
+
+
+@login_required
+def export_jobs(request):
+    jobs = ExportJob.objects.filter(
+        requested_by=request.user
+    ).order_by('-inserted_date')[:10]
+    return render(
+        request=request,
+        template_name="core/export_jobs.html",
+        context={
+            'jobs': jobs,
+            'ttl_hours': settings.EXPORT_TTL_HOURS
+        }
+    )
+
+
+@login_required
+@require_POST
+def start_export(request):
+    file_format = request.POST.get('file_format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        file_format = 'csv'
+    params = table_params(QueryDict(request.POST.get('query', '')))
+    job = ExportJob.objects.create(
+        requested_by=request.user,
+        file_format=file_format,
+        params=params
+    )
+    run_export_job.delay(job.pk)
+
+    if request.headers.get('HX-Request'):
         return render(
             request=request,
-            template_name="core/notes.html",
-            context={
-                'item': item,
-                'item_notes': item_notes
-            }
+            template_name="core/includes/_export_job.html",
+            context={'job': job}
         )
+    messages.info(request, 'Your export has been queued.')
+    return redirect('core:export_jobs')
 
 
 @login_required
-def export_to_excel(request):
+def export_status(request, id):
+    job = get_object_or_404(ExportJob, id=id, requested_by=request.user)
+    return render(
+        request=request,
+        template_name="core/includes/_export_job.html",
+        context={'job': job}
+    )
+
 
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="inventory.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(
-        [
-            'ID',
-            'Status',
-            'Item',
-            'Description',
-            'Model #',
-            'Serial #',
-            'Qty',
-            'Total Cost',
-            'Assigned To',
-            'Approval Date',
-            'Purchase Date',
-            'Inserted By Last Name',
-            'Inserted By First Name',
-            'Inserted Date',
-            'Modified By',
-            'Modified Date',
-            'Approved By',
-            'Location',
-            'Area',
-            'Mfg'
-        ]
+@login_required
+def download_export(request, id):
+    job = get_object_or_404(
+        ExportJob,
+        id=id,
+        requested_by=request.user,
+        status=ExportJob.Status.DONE
+    )
+    path = export_path(job.file_name)
+    if not os.path.exists(path):
+        raise Http404('This export is no longer available.')
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=f'inventory.{job.file_format}',
+        content_type=EXPORT_FORMATS[job.file_format].content_type
     )
 
-    items = InventoryItem.objects.all().values_list(
-        'id',
-        'stat__name',
-        'name',
-        'description',
-        'model_no',
-        'serial_no',
-        'qty',
-        'total_cost',
-        'assigned_to',
-        'approved_date',
-        'purchase_date',
-        'inserted_by__last_name',
-        'inserted_by__first_name',
-        'inserted_date',
-        'modified_by',
-        'modified_date',
-        'approved_by_id__name',
-        'item_location_id__name',
-        'item_area_id__name',
-        'mfg_id__name'
+
+@login_required
+def import_inventory(request):
+    result = None
+    if request.method == "POST":
+        upload = request.FILES.get('file')
+        dry_run = bool(request.POST.get('dry_run'))
+        if upload is None:
+            messages.error(request, 'Choose a CSV or Excel file to import.')
+            return redirect('core:import_inventory')
+        try:
+            rows = read_upload(upload.file, upload.name)
+            result = import_items(rows, request.user, dry_run=dry_run)
+        except (ValueError, csv.Error) as e:
+            messages.error(request, f'The file could not be read: {e}')
+            return redirect('core:import_inventory')
+
+        if dry_run:
+            messages.info(
+                request,
+                f'Dry run: {result.valid} of {result.rows} rows are valid. '
+                'Nothing was imported.'
+            )
+        elif result.created:
+            messages.success(
+                request,
+                f'{result.created} of {result.rows} rows imported.'
+            )
+        if result.errors and 'report' in request.POST:
+            response = StreamingHttpResponse(
+                result.error_report(), content_type='text/csv'
+            )
+            response['Content-Disposition'] = (
+                'attachment; filename="import_errors.csv"'
+            )
+            return response
+
+    return render(
+        request=request,
+        template_name="core/import_inventory.html",
+        context={'result': result}
+    )
+
+
+@staff_member_required
+def profiles(request):
+    return render(
+        request=request,
+        template_name="core/profiles.html",
+        context={'profiles': recent_profiles()}
+    )
+
+
+@staff_member_required
+def profile_detail(request, name):
+    profile = load_profile(name)
+    if profile is None:
+        raise Http404('No such profile.')
+    return render(
+        request=request,
+        template_name="core/profile_detail.html",
+        context={'profile': profile}
+    )
+
+
+@staff_member_required
+def download_profile(request, name):
+    path = folded_path(name)
+    if path is None:
+        raise Http404('No such profile.')
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=f'{name}.folded',
+        content_type='text/plain'
+    )
+
+
+@staff_member_required
+def slow_queries(request):
+    if request.method == "POST":
+        SlowQuery.objects.all().delete()
+        messages.success(request, 'Slow query log cleared.')
+        return redirect("core:slow_queries")
+    return render(
+        request=request,
+        template_name="core/slow_queries.html",
+        context={
+            'groups': slow_query_summary(),
+            'threshold_ms': settings.SLOW_QUERY_MS
+        }
     )
 
-    for item in items:
-        writer.writerow(item)
-    return response
+
+@require_safe
+def metrics(request):
+    token = settings.METRICS_TOKEN
+    authorized = request.user.is_staff or (
+        token and hmac.compare_digest(
+            request.headers.get('Authorization', ''), f'Bearer {token}'
+        )
+    )
+    if not authorized:
+        return HttpResponseForbidden()
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
 
 
 def login_request(request):
@@ -441,22 +902,20 @@ def login_request(request):
         return redirect("core:index")
 
 
+@require_POST
+@rate_limit('availability', 30, 60)
 def check_username(request):
-    username = request.POST.get('username')
-    try:
-        user = User.objects.get(username=username)
+    if is_taken('username', request.POST.get('username')):
         return HttpResponse('<div id="username-error" class="error">This username already exists!</div>')
-    except User.DoesNotExist:
-        return HttpResponse('<div id="username-error" class="success">This username is available.</div>')
+    return HttpResponse('<div id="username-error" class="success">This username is available.</div>')
 
 
+@require_POST
+@rate_limit('availability', 30, 60)
 def check_email(request):
-    email = request.POST.get('email')
-    try:
-        user = User.objects.get(email=email)
+    if is_taken('email', request.POST.get('email')):
         return HttpResponse('<div id="email-error" class="error">This email already exists!</div>')
-    except User.DoesNotExist:
-        return HttpResponse('<div id="email-error" class="success">This email is available.</div>')
+    return HttpResponse('<div id="email-error" class="success">This email is available.</div>')
 
 
 def register(request):
@@ -0,0 +1,58 @@
+"""
+Settings for the servers and workers started by ``manage.py load_test``.
+
+They extend the settings the harness itself runs with (LOADTEST_BASE_SETTINGS)
+and swap the outside services for local stand-ins: a filesystem broker and
+result backend, a file cache and the harness's SMTP sink, all under
+LOADTEST_DIR, plus the throwaway database the harness seeded.
+"""
+
+import copy
+import importlib
+import os
+
+_base = importlib.import_module(
+    os.environ.get('LOADTEST_BASE_SETTINGS', 'proj.settings')
+)
+globals().update(
+    (name, value) for name, value in vars(_base).items() if name.isupper()
+)
+
+LOADTEST_DIR = os.environ['LOADTEST_DIR']
+
+# Closer to production: no per-query bookkeeping, no debug pages
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+DATABASES = copy.deepcopy(_base.DATABASES)
+DATABASES['default']['NAME'] = os.environ['LOADTEST_DB_NAME']
+if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+    # Let concurrent writers queue up instead of failing straight away
+    DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = 30
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(LOADTEST_DIR, 'cache'),
+    }
+}
+
+CELERY_BROKER_URL = 'filesystem://'
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'data_folder_in': os.path.join(LOADTEST_DIR, 'broker'),
+    'data_folder_out': os.path.join(LOADTEST_DIR, 'broker'),
+}
+CELERY_RESULT_BACKEND = f'file://{os.path.join(LOADTEST_DIR, "results")}'
+CELERY_TASK_ALWAYS_EAGER = False
+# The filesystem transport has no broadcast for remote control
+CELERY_WORKER_ENABLE_REMOTE_CONTROL = False
+
+EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_HOST = '127.0.0.1'
+EMAIL_PORT = int(os.environ['LOADTEST_SMTP_PORT'])
+EMAIL_USE_TLS = False
+EMAIL_HOST_USER = ''
+EMAIL_HOST_PASSWORD = ''
+
+EXPORT_ROOT = os.path.join(LOADTEST_DIR, 'exports')
+PROFILE_ROOT = os.path.join(LOADTEST_DIR, 'profiles')